@@ -0,0 +1,109 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ShoppingCartExporter(BaseRenderer):
+    """Базовый класс выгрузки списка покупок.
+
+    Экспортёры подключаются к действию как renderer_classes, поэтому формат
+    выбирается стандартным для DRF способом: ``?format=`` или ``Accept``.
+    """
+    charset = None
+    extension = None
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # Ответы с ошибками (например, 401) приходят словарём.
+            return str(data.get('detail', data)).encode()
+        return b''.join(self.stream(data))
+
+
+class TextExporter(ShoppingCartExporter):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def stream(self, ingredients):
+        for ingredient in ingredients:
+            yield (f"- {ingredient['ingredient__name']}: "
+                   f"{ingredient['total']} "
+                   f"{ingredient['ingredient__measurement_unit']}\n").encode()
+
+
+class CSVExporter(ShoppingCartExporter):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, ingredients):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+        for ingredient in ingredients:
+            writer.writerow((ingredient['ingredient__name'],
+                             ingredient['total'],
+                             ingredient['ingredient__measurement_unit']))
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode()
+
+
+class PDFExporter(ShoppingCartExporter):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    font_size = 12
+    margin = 50
+
+    @staticmethod
+    def get_font():
+        path = settings.SHOPPING_CART_PDF_FONT
+        if not os.path.exists(path):
+            return 'Helvetica'
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(name, path))
+        return name
+
+    def stream(self, ingredients):
+        buffer = io.BytesIO()
+        font = self.get_font()
+        width, height = A4
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        pdf.setTitle('Список покупок')
+        pdf.setFont(font, self.font_size + 4)
+        pdf.drawString(self.margin, height - self.margin, 'Список покупок')
+        y = height - self.margin - 2 * self.font_size
+        pdf.setFont(font, self.font_size)
+        for ingredient in ingredients:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(font, self.font_size)
+                y = height - self.margin
+            pdf.drawString(self.margin, y,
+                           f"• {ingredient['ingredient__name']}: "
+                           f"{ingredient['total']} "
+                           f"{ingredient['ingredient__measurement_unit']}")
+            y -= self.font_size * 1.5
+        pdf.save()
+        buffer.seek(0)
+        for chunk in iter(lambda: buffer.read(CHUNK_SIZE), b''):
+            yield chunk
+
+
+SHOPPING_CART_EXPORTERS = (TextExporter, CSVExporter, PDFExporter)
@@ -0,0 +1,52 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+def get_objects(queryset, ids):
+    """Загружает объекты одним запросом id__in в порядке ids.
+
+    Все несуществующие id перечисляются в одной ошибке.
+    """
+    objects = queryset.in_bulk(set(ids))
+    missing = [str(pk) for pk in dict.fromkeys(ids) if pk not in objects]
+    if missing:
+        raise serializers.ValidationError(
+            f'Объекты с id {", ".join(missing)} не существуют.'
+        )
+    return [objects[pk] for pk in ids]
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список первичных ключей, проверяемый одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        ids = [self.child_relation.to_pk(item) for item in data]
+        return get_objects(self.child_relation.get_queryset(), ids)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который с many=True не ходит в базу
+    за каждым объектом отдельно."""
+
+    def to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
@@ -1,23 +1,49 @@
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Ingredient, Recipe, Tag
 
 FILTER_USER = {'favorites': 'favorites__user',
                'shopping_cart': 'shopping_cart__user'}
+TAGS_MODES = (('or', 'Любой из тегов'), ('and', 'Все теги'))
+ORDERINGS = {
+    'recent': ('-pub_date', '-id'),
+    'popular': (F('popularity__score').desc(nulls_last=True),
+                '-pub_date', '-id'),
+    'quick': ('cooking_time', '-pub_date', '-id'),
+}
 
 
 class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name', )
 
+    def filter_name(self, queryset, name, value):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        return queryset.filter(name__icontains=value).annotate(
+            rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('rank', 'name')
+
 
 class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='filter_tags',
+    )
+    tags_mode = filters.ChoiceFilter(choices=TAGS_MODES,
+                                     method='filter_tags_mode')
+    ordering = filters.ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in ORDERINGS],
+        method='filter_ordering',
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -28,6 +54,26 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
 
+    def filter_tags(self, queryset, name, value):
+        """Подзапрос к промежуточной таблице вместо JOIN: без дублей и
+        без DISTINCT по всем полям рецепта."""
+        if not value:
+            return queryset
+        tag_ids = {tag.id for tag in value}
+        recipe_ids = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        if self.form.cleaned_data.get('tags_mode') == 'and':
+            recipe_ids = recipe_ids.values('recipe_id').annotate(
+                tags_count=Count('tag_id')
+            ).filter(tags_count=len(tag_ids))
+        return queryset.filter(id__in=recipe_ids.values('recipe_id'))
+
+    def filter_tags_mode(self, queryset, name, value):
+        # Режим учитывается в filter_tags.
+        return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
+
     def _get_queryset(self, queryset, name, value, model):
         if value:
             return queryset.filter(**{FILTER_USER[model]: self.request.user})
@@ -0,0 +1,189 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Registry:
+    """Метрики процесса с общим хранилищем в файлах.
+
+    Значения копятся в памяти и не чаще раза в METRICS_FLUSH_INTERVAL секунд
+    сбрасываются в файл METRICS_DIR/<pid>.json. /metrics складывает файлы
+    всех процессов, поэтому счётчики воркеров gunicorn суммируются.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.flushed = 0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    @property
+    def enabled(self):
+        return settings.METRICS
+
+    def add(self, name, labels, value):
+        with self.lock:
+            if self.pid != os.getpid():
+                # Процесс получен через fork: значения родителя уже
+                # учтены в его собственном файле.
+                self.pid = os.getpid()
+                self.values.clear()
+            self.values[(name, labels)] += value
+
+    def get_path(self, pid):
+        return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed = now
+        with self.lock:
+            if self.pid != os.getpid():
+                return
+            data = [[name, labels, value]
+                    for (name, labels), value in self.values.items()]
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = self.get_path(self.pid)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(data, file)
+        os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        totals = defaultdict(float)
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            try:
+                with open(path) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data:
+                totals[(name, tuple(map(tuple, labels)))] += value
+        return totals
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        samples = defaultdict(list)
+        for (name, labels), value in sorted(self.collect().items(),
+                                            key=sample_key):
+            samples[name].append((labels, value))
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name in metric.sample_names():
+                for labels, value in samples.get(name, ()):
+                    lines.append(f'{name}{format_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def sample_key(item):
+    """Порядок вывода: корзины гистограммы по возрастанию границы."""
+    (name, labels), _ = item
+    return name, tuple(
+        (key, float(value.replace('+Inf', 'inf')) if key == 'le' else value)
+        for key, value in labels
+    )
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', r'\\').replace('"', r'\"')
+         .replace('\n', r'\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        registry.register(self)
+
+    def get_labels(self, labels):
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def sample_names(self):
+        return (self.name,)
+
+    def inc(self, value=1, **labels):
+        if registry.enabled:
+            registry.add(self.name, self.get_labels(labels), value)
+
+
+class Histogram(Counter):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def sample_names(self):
+        return (f'{self.name}_bucket', f'{self.name}_sum',
+                f'{self.name}_count')
+
+    def observe(self, value, **labels):
+        if not registry.enabled:
+            return
+        labels = self.get_labels(labels)
+        for bucket in self.buckets:
+            if value <= bucket:
+                registry.add(f'{self.name}_bucket',
+                             labels + (('le', f'{bucket:g}'),), 1)
+        registry.add(f'{self.name}_bucket', labels + (('le', '+Inf'),), 1)
+        registry.add(f'{self.name}_sum', labels, value)
+        registry.add(f'{self.name}_count', labels, 1)
+
+
+registry = Registry()
+atexit.register(lambda: registry.enabled and registry.flush(force=True))
+
+REQUEST_DURATION = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса приложением',
+    ('route', 'method'),
+)
+REQUEST_QUEUE = Histogram(
+    'foodgram_http_request_queue_seconds',
+    'Время от приёма запроса nginx до начала обработки (X-Request-Start)',
+    ('route',),
+)
+RESPONSES = Counter(
+    'foodgram_http_responses_total',
+    'Ответы по маршрутам и кодам статуса',
+    ('route', 'status'),
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries_total',
+    'Запросы к базе данных по маршрутам',
+    ('route',),
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшу ответов',
+    ('cache', 'result'),
+)
+
+
+def count_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
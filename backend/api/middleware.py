@@ -0,0 +1,194 @@
+import json
+import logging
+import re
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+
+logger = logging.getLogger('foodgram.timing')
+PARAMS_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+
+def sql_shape(sql):
+    """Запрос без длины списков IN: одинаковые запросы с разными
+    параметрами дают одну форму."""
+    return PARAMS_LIST.sub('(%s, ...)', sql)
+
+
+def get_source():
+    """Ближайший к запросу код проекта, например
+    ``RecipeSerializer._obj_exists``."""
+    frame = sys._getframe(2)
+    root = str(settings.BASE_DIR)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(root) and filename != __file__
+                and 'site-packages' not in filename):
+            name = frame.f_code.co_name
+            owner = frame.f_locals.get('self')
+            if owner is not None:
+                name = f'{type(owner).__name__}.{name}'
+            return f'{name} ({filename[len(root) + 1:]}:{frame.f_lineno})'
+        frame = frame.f_back
+    return None
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = self.view_finished = None
+        self.response_ready = None
+        self.db_time = 0
+        self.shapes = Counter()
+        self.sources = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = sql_shape(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == 2:
+            self.sources[shape] = get_source()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+
+    def get_suspects(self, threshold):
+        return [
+            {'count': count, 'source': self.sources.get(shape),
+             'sql': shape[:200]}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class RequestTimingMiddleware:
+    """Время запроса, работы с базой, представления и отрисовки ответа.
+
+    Результат отдаётся в заголовке Server-Timing и пишется в лог
+    foodgram.timing одной строкой JSON. Одинаковые по форме SQL-запросы,
+    повторённые REQUEST_TIMING_N_PLUS_ONE раз и больше, помечаются как
+    подозрение на N+1 с указанием вызвавшего их кода.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.REQUEST_TIMING_N_PLUS_ONE
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        request.timing = timing
+        with connection.execute_wrapper(timing):
+            response = self.get_response(request)
+        timing.response_ready = time.perf_counter()
+        if response.streaming:
+            # Заголовки уходят раньше, чем генератор выполнит свои запросы
+            # к базе, поэтому Server-Timing не отдаётся, а итог пишется в
+            # лог после отправки последней части.
+            response.streaming_content = self.stream(
+                request, response, timing, response.streaming_content
+            )
+        else:
+            response['Server-Timing'] = self.finish(request, response,
+                                                    timing)
+        return response
+
+    def stream(self, request, response, timing, content):
+        try:
+            with connection.execute_wrapper(timing):
+                yield from content
+        finally:
+            self.finish(request, response, timing)
+
+    def finish(self, request, response, timing):
+        """Пишет итог запроса в лог и возвращает значение Server-Timing."""
+        total = time.perf_counter() - timing.started
+        view = render = 0
+        if timing.view_started is not None:
+            view = (timing.view_finished or timing.response_ready
+                    ) - timing.view_started
+        if timing.view_finished is not None:
+            # Между process_template_response и возвратом из get_response
+            # Django только отрисовывает ответ.
+            render = timing.response_ready - timing.view_finished
+        queries = sum(timing.shapes.values())
+        suspects = timing.get_suspects(self.threshold)
+        timings = [
+            f'db;dur={timing.db_time * 1000:.2f};desc="{queries} queries"',
+            f'view;dur={view * 1000:.2f}',
+            f'render;dur={render * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]
+        if suspects:
+            timings.append(f'n1;desc="{len(suspects)} suspects"')
+        log = logger.warning if suspects else logger.info
+        log(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'streaming': response.streaming,
+            'queries': queries,
+            'db_ms': round(timing.db_time * 1000, 2),
+            'view_ms': round(view * 1000, 2),
+            'render_ms': round(render * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'n_plus_one': suspects,
+        }, ensure_ascii=False))
+        return ', '.join(timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request.timing.view_finished = time.perf_counter()
+        return response
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Гистограммы времени ответа и счётчики запросов к базе по имени
+    маршрута DRF (recipes-list, recipes-download-shopping-cart, ...)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        queue_time = self.get_queue_time(request)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        route = getattr(request.resolver_match, 'url_name', None)
+        route = route or 'unmatched'
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - started,
+                                         route=route, method=request.method)
+        metrics.RESPONSES.inc(route=route, status=response.status_code)
+        metrics.DB_QUERIES.inc(counter.count, route=route)
+        if queue_time is not None:
+            metrics.REQUEST_QUEUE.observe(queue_time, route=route)
+        metrics.registry.flush()
+        return response
+
+    @staticmethod
+    def get_queue_time(request):
+        """Ожидание в очереди gunicorn по заголовку nginx
+        ``X-Request-Start: t=<секунды>``."""
+        header = request.META.get('HTTP_X_REQUEST_START', '')
+        try:
+            started = float(header.replace('t=', '', 1))
+        except ValueError:
+            return None
+        return max(time.time() - started, 0)
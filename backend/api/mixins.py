@@ -1,4 +1,13 @@
-from rest_framework import mixins, viewsets
+import hashlib
+
+from django.core.cache import cache
+from django.utils.http import http_date, parse_http_date_safe
+
+from recipes.cache import get_model_version
+from rest_framework import mixins, status, viewsets
+from rest_framework.response import Response
+
+from .metrics import count_cache
 
 
 class RetrieveListViewSet(
@@ -7,3 +16,53 @@ class RetrieveListViewSet(
     viewsets.GenericViewSet
 ):
     pass
+
+
+class CachedReadOnlyMixin:
+    """Кэширует ответы list/retrieve справочников до изменения модели.
+
+    Версия данных меняется сигналами post_save/post_delete модели,
+    поэтому повторный запрос не обращается к базе и не сериализует данные.
+    """
+    cache_timeout = 60 * 60 * 24
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, request, method, *args, **kwargs):
+        version = get_model_version(self.queryset.model)
+        path = request.get_full_path()
+        digest = hashlib.md5(f'{version}:{path}'.encode()).hexdigest()
+        headers = {'ETag': f'"{digest}"',
+                   'Last-Modified': http_date(version)}
+        if self.is_not_modified(request, headers['ETag'], version):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+        key = f'reference:{digest}'
+        data = cache.get(key)
+        count_cache('reference', data is not None)
+        if data is None:
+            response = method(*args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, self.cache_timeout)
+        return Response(data, headers=headers)
+
+    @staticmethod
+    def is_not_modified(request, etag, version):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return etag in (tag.strip() for tag in if_none_match.split(','))
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+        )
+        return (if_modified_since is not None
+                and int(version) <= if_modified_since)
@@ -1,5 +1,123 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод рецептов по ключу (pub_date, id).
+
+    Следующая страница начинается строго после последнего рецепта
+    предыдущей, поэтому запрос не делает ни COUNT, ни OFFSET и стоит
+    одинаково на любой глубине прокрутки.
+    """
+    page_size = PageLimitPagination.page_size
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size and page_size.isdigit() and int(page_size) > 0:
+            return min(int(page_size), self.max_page_size)
+        return self.page_size
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            pub_date, pk = base64.urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            pub_date, pk = parse_datetime(pub_date), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            # parse_datetime возвращает None для строки не в формате ISO.
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    @staticmethod
+    def encode_cursor(recipe):
+        position = f'{recipe.pub_date.isoformat()}|{recipe.pk}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-pub_date', '-id')
+        position = self.decode_cursor(request)
+        if position is not None:
+            pub_date, pk = position
+            # Первое условие задаёт диапазон по индексу, второе
+            # отсекает уже показанные рецепты с той же датой.
+            queryset = queryset.filter(
+                Q(pub_date__lte=pub_date)
+                & (Q(pub_date__lt=pub_date) | Q(id__lt=pk))
+            )
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param,
+                                   self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class PageLimitOrCursorPagination(PageLimitPagination):
+    """page/limit по умолчанию, курсор по запросу клиента.
+
+    Режим курсора включается параметром ``?cursor=`` (пустое значение -
+    первая страница) или заголовком ``X-Pagination: cursor``. Курсор
+    всегда идёт от новых рецептов к старым, независимо от ``?ordering=``.
+    """
+    cursor_header = 'HTTP_X_PAGINATION'
+
+    def use_cursor(self, request):
+        return (KeysetPagination.cursor_query_param in request.query_params
+                or request.META.get(self.cursor_header, '').lower()
+                == 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_cursor(request):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,34 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """multipart/form-data с фото отдельным файлом.
+
+    Файл сохраняется обработчиками загрузки Django частями (крупный - во
+    временный файл на диске), а вложенные поля передаются строкой JSON:
+    ``ingredients=[{"id": 1, "amount": 10}]``. Теги можно передать так же
+    или повторяющимся полем ``tags``.
+    """
+    json_fields = ('ingredients', 'tags')
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        data = {}
+        for key, values in parsed.data.lists():
+            if key in self.json_fields:
+                data[key] = self.decode(key, values)
+            else:
+                data[key] = values[-1]
+        return DataAndFiles(data, dict(parsed.files.items()))
+
+    @staticmethod
+    def decode(key, values):
+        if len(values) == 1 and values[0].lstrip().startswith('['):
+            try:
+                return json.loads(values[0])
+            except ValueError:
+                raise ParseError(f'Поле {key} содержит неверный JSON.')
+        return values
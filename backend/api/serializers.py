@@ -1,12 +1,17 @@
 from django.db import transaction
+from django.db.models import F, prefetch_related_objects
 
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from drf_extra_fields.fields import Base64ImageField, HybridImageField
+from recipes.images import enqueue
 from recipes.models import (Favorite, Follow, Ingredient, IngredientContained,
                             Recipe, ShoppingList, Tag)
 from rest_framework import serializers
 from users.models import CustomUser
 
+from .fields import BulkPrimaryKeyRelatedField, get_objects
+from .utils import invalidate_shopping_cart
+
 
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
@@ -17,6 +22,8 @@ class CustomUserSerializer(UserSerializer):
                   'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -73,13 +80,22 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'image_thumbnail',
+                  'image_webp', 'text', 'cooking_time')
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_author_subscribed'):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return self._obj_exists(obj, Favorite)
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return self._obj_exists(obj, ShoppingList)
 
     def _obj_exists(self, recipe, name_class):
@@ -90,22 +106,33 @@ class RecipeSerializer(serializers.ModelSerializer):
                                          recipe=recipe).exists()
 
 
+class AddIngredientListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        ingredients = super().to_internal_value(data)
+        objects = get_objects(Ingredient.objects.all(),
+                              [item['id'] for item in ingredients])
+        for item, ingredient in zip(ingredients, objects):
+            item['id'] = ingredient
+        return ingredients
+
+
 class AddIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientContained
         fields = ('id', 'amount')
+        list_serializer_class = AddIngredientListSerializer
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     ingredients = AddIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
     )
-    image = Base64ImageField()
+    image = HybridImageField()
 
     class Meta:
         model = Recipe
@@ -113,7 +140,15 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                   'text', 'cooking_time',)
 
     def validate(self, data):
-        tags = data['tags']
+        if 'tags' in data:
+            self.check_tags(data['tags'])
+        if 'ingredients' in data:
+            self.check_ingredients(data['ingredients'])
+        if 'cooking_time' in data:
+            self.check_cooking_time(data['cooking_time'])
+        return data
+
+    def check_tags(self, tags):
         if not tags:
             raise serializers.ValidationError({
                 'tags': 'Тег обязателен для заполнения!'
@@ -125,7 +160,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                     'tags': f'Тег {tag} уже существует, внесите новый!'
                 })
             tags_set.add(tag)
-        ingredients = data['ingredients']
+
+    def check_ingredients(self, ingredients):
         ingredients_set = set()
         if not ingredients:
             raise serializers.ValidationError({
@@ -144,12 +180,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({
                     'amount': 'Количество ингредиента должно быть больше 0!'
                 })
-        cooking_time = data['cooking_time']
+
+    def check_cooking_time(self, cooking_time):
         if int(cooking_time) < 1:
             raise serializers.ValidationError({
                 'cooking_time': 'Время приготовления должно быть больше 0!'
             })
-        return data
 
     def add_ingredients(self, ingredients, recipe):
         new_ingredients = [IngredientContained(
@@ -160,8 +196,34 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         IngredientContained.objects.bulk_create(new_ingredients)
 
     def add_tags(self, tags, recipe):
-        for tag in tags:
-            recipe.tags.add(tag)
+        recipe.tags.add(*tags)
+
+    def set_ingredients(self, ingredients, recipe):
+        """Записывает в базу только изменившиеся строки состава."""
+        current = {item.ingredient_id: item
+                   for item in recipe.ingredient_contained.all()}
+        amounts = {item['id'].id: item['amount'] for item in ingredients}
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id, item.amount)
+            if item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        removed = current.keys() - amounts.keys()
+        added = [item for item in ingredients
+                 if item['id'].id not in current]
+        if removed:
+            IngredientContained.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        if changed:
+            IngredientContained.objects.bulk_update(changed, ('amount',))
+        if added:
+            self.add_ingredients(added, recipe)
+        if changed or added:
+            invalidate_shopping_cart(ShoppingList.objects.filter(
+                recipe=recipe
+            ).values_list('user_id', flat=True))
 
     @transaction.atomic
     def create(self, validated_data):
@@ -169,48 +231,53 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=author, **validated_data)
+        CustomUser.objects.filter(pk=author.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
         self.add_tags(tags, recipe)
         self.add_ingredients(ingredients, recipe)
+        enqueue(recipe)
         return recipe
 
     def to_representation(self, instance):
+        # После save() DRF сбрасывает кэш prefetch_related, без повторной
+        # выборки ингредиенты читались бы по одному запросу на строку.
+        prefetch_related_objects(
+            [instance], 'tags', 'ingredient_contained__ingredient'
+        )
         return representation(self.context, instance, RecipeSerializer)
 
     @transaction.atomic
     def update(self, recipe, validated_data):
-        recipe.tags.clear()
-        IngredientContained.objects.filter(recipe=recipe).delete()
-        self.add_tags(validated_data.pop('tags'), recipe)
-        self.add_ingredients(validated_data.pop('ingredients'), recipe)
-        return super().update(recipe, validated_data)
+        if 'tags' in validated_data:
+            recipe.tags.set(validated_data.pop('tags'))
+        if 'ingredients' in validated_data:
+            self.set_ingredients(validated_data.pop('ingredients'), recipe)
+        recipe = super().update(recipe, validated_data)
+        if 'image' in validated_data:
+            enqueue(recipe)
+        return recipe
 
 
 class RecipeListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail', 'image_webp',
+                  'cooking_time')
 
 
 class FollowSerializer(CustomUserSerializer):
-    recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    """Автор из подписок: рецепты и их количество уже загружены во view."""
+    recipes = RecipeListSerializer(many=True, read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = CustomUser
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
                   'is_subscribed', 'recipes', 'recipes_count',)
 
-    def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.recipes.all()
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
-        return RecipeListSerializer(recipes, many=True).data
-
-    @staticmethod
-    def get_recipes_count(obj):
-        return obj.recipes.count()
+    def get_is_subscribed(self, obj):
+        return True
 
 
 class FavoriteSerializer(RecipeListSerializer):
@@ -237,6 +304,14 @@ class ShoppingListSerializer(RecipeListSerializer):
             RecipeListSerializer)
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
 def representation(context, instance, serializer):
     request = context.get('request')
     new_context = {'request': request}
@@ -0,0 +1,66 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from recipes.models import (Ingredient, IngredientContained, Recipe,
+                            ShoppingList, Tag)
+from users.models import CustomUser
+
+from .utils import invalidate_recipes, invalidate_shopping_cart
+
+
+@receiver((post_save, post_delete), sender=ShoppingList)
+def shopping_list_changed(sender, instance, **kwargs):
+    invalidate_shopping_cart((instance.user_id,))
+
+
+@receiver((post_save, post_delete), sender=IngredientContained)
+def ingredient_contained_changed(sender, instance, **kwargs):
+    invalidate_shopping_cart(ShoppingList.objects.filter(
+        recipe_id=instance.recipe_id
+    ).values_list('user_id', flat=True))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes((instance.pk,))
+
+
+@receiver((post_save, post_delete), sender=IngredientContained)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    invalidate_recipes((instance.recipe_id,))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_recipes((instance.pk,))
+    elif action == 'pre_clear':
+        invalidate_recipes(instance.recipes.values_list('id', flat=True))
+    else:
+        invalidate_recipes(pk_set)
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    invalidate_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes(instance.ingredient_contained.values_list(
+        'recipe_id', flat=True
+    ))
+    # Название и единица измерения входят в выгрузку списка покупок.
+    invalidate_shopping_cart(ShoppingList.objects.filter(
+        recipe__ingredient_contained__ingredient=instance
+    ).values_list('user_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=CustomUser)
+def author_changed(sender, instance, update_fields, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_recipes(instance.recipes.values_list('id', flat=True))
@@ -0,0 +1,278 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, modify_settings
+from django.test.utils import CaptureQueriesContext
+
+from recipes.management.commands.explain_filters import check
+from recipes.models import (Favorite, Ingredient, IngredientContained,
+                            Recipe, ShoppingList, Tag)
+from rest_framework.test import APIClient
+from users.models import CustomUser
+
+from .utils import (RECIPE_VERSION_KEY, SHOPPING_CART_VERSION_KEY,
+                    get_recipe_cache_key, get_recipe_cache_stats,
+                    get_shopping_cart_key, invalidate_recipes,
+                    invalidate_shopping_cart)
+
+
+class RecipeTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(5)
+        ]
+        cls.user = CustomUser.objects.create_user(
+            email='user@example.com', username='user', first_name='Имя',
+            last_name='Фамилия', password='password-123',
+        )
+        cls.recipes = []
+        for i in range(6):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {i}', author=cls.user, text='Описание',
+                cooking_time=10 + i, image='recipe_images/test.png',
+            )
+            recipe.tags.set(cls.tags[:1 + i % 3])
+            IngredientContained.objects.bulk_create([
+                IngredientContained(recipe=recipe, ingredient=ingredient,
+                                    amount=10 * (i + 1))
+                for ingredient in cls.ingredients[:3]
+            ])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class RecipeQueriesTest(RecipeTestCase):
+    """Число запросов к базе не зависит от числа рецептов на странице."""
+
+    def test_recipe_list_queries(self):
+        for client in (self.anonymous, self.client):
+            for limit in (1, len(self.recipes)):
+                with self.subTest(authenticated=client is self.client,
+                                  limit=limit):
+                    with self.assertNumQueries(5):
+                        response = client.get(f'/api/recipes/?limit={limit}')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_invalid_cursor(self):
+        # base64 от 'abc|5': дата не в формате ISO.
+        response = self.anonymous.get('/api/recipes/?cursor=YWJjfDU=')
+        self.assertEqual(response.status_code, 404)
+
+
+class RecipeScoreTest(RecipeTestCase):
+    def test_new_recipe_is_scored(self):
+        recipe = Recipe.objects.create(
+            name='Новый рецепт', author=self.user, text='Описание',
+            cooking_time=5, image='recipe_images/test.png',
+        )
+        self.assertFalse(recipe.popularity.stale)
+        response = self.anonymous.get('/api/recipes/?ordering=popular')
+        self.assertEqual(response.data['results'][0]['id'], recipe.id)
+
+
+class RecipeUpdateQueriesTest(RecipeTestCase):
+    """PATCH пишет в базу только то, что изменилось."""
+    relation_tables = ('recipes_ingredientcontained', 'recipes_recipe_tags')
+
+    def patch(self, data):
+        recipe = self.recipes[0]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(f'/api/recipes/{recipe.id}/', data,
+                                         format='json')
+        self.assertEqual(response.status_code, 200)
+        writes = [
+            query['sql'] for query in context.captured_queries
+            if not query['sql'].startswith('SELECT')
+            and any(table in query['sql'] for table in self.relation_tables)
+        ]
+        self.assertEqual(writes, [])
+        return len(context.captured_queries)
+
+    def test_noop_update(self):
+        recipe = self.recipes[0]
+        data = {
+            'name': recipe.name, 'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [tag.id for tag in recipe.tags.all()],
+            'ingredients': [
+                {'id': item.ingredient_id, 'amount': item.amount}
+                for item in recipe.ingredient_contained.all()
+            ],
+        }
+        # Рецепт с тегами и составом (4), проверка тегов и ингредиентов
+        # из запроса (2), текущие теги (1), UPDATE рецепта в точке
+        # сохранения (3), ответ (3).
+        self.assertEqual(self.patch(data), 13)
+
+    def test_single_field_update(self):
+        self.assertEqual(self.patch({'text': 'Новое описание'}), 10)
+
+
+class BatchCreateTest(RecipeTestCase):
+    def test_concurrent_insert_not_counted(self):
+        first, second = self.recipes[:2]
+        get_or_create = Favorite.objects.get_or_create
+
+        def insert_concurrently(**kwargs):
+            # Параллельный запрос успел вставить ту же строку после
+            # проверки существующих.
+            if kwargs['recipe_id'] == first.id:
+                Favorite.objects.bulk_create([Favorite(**kwargs)])
+            return get_or_create(**kwargs)
+
+        with mock.patch.object(Favorite.objects, 'get_or_create',
+                               insert_concurrently):
+            response = self.client.post(
+                '/api/recipes/favorite/',
+                {'recipes': [first.id, second.id]}, format='json',
+            )
+        self.assertEqual(response.data['results'], [
+            {'id': first.id, 'status': 'exists'},
+            {'id': second.id, 'status': 'created'},
+        ])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.favorites_count, 0)
+        self.assertEqual(second.favorites_count, 1)
+
+
+@modify_settings(MIDDLEWARE={
+    'append': 'api.middleware.RequestTimingMiddleware',
+})
+class RequestTimingTest(RecipeTestCase):
+    def test_server_timing(self):
+        with self.assertLogs('foodgram.timing', 'INFO') as logs:
+            response = self.anonymous.get('/api/recipes/')
+        self.assertIn('render;dur=', response['Server-Timing'])
+        self.assertEqual(json.loads(logs.records[0].getMessage())['queries'],
+                         5)
+
+    def test_streaming_logged_after_content(self):
+        ShoppingList.objects.create(user=self.user, recipe=self.recipes[0])
+        with self.assertLogs('foodgram.timing', 'INFO') as logs:
+            response = self.client.get('/api/recipes/download_shopping_cart/')
+            self.assertEqual(logs.records, [])
+            b''.join(response.streaming_content)
+        self.assertNotIn('Server-Timing', response)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(record['streaming'])
+        # Состав корзины читается уже при отправке файла.
+        self.assertGreater(record['queries'], 0)
+
+
+class CacheInvalidationTest(TransactionTestCase):
+    """Сброс версий выполняется в on_commit, поэтому нужны настоящие
+    транзакции."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='user@example.com', username='user', first_name='Имя',
+            last_name='Фамилия', password='password-123',
+        )
+        self.ingredient = Ingredient.objects.create(name='Соль',
+                                                    measurement_unit='г')
+        recipe = Recipe.objects.create(
+            name='Рецепт', author=self.user, text='Описание',
+            cooking_time=5, image='recipe_images/test.png',
+        )
+        IngredientContained.objects.create(recipe=recipe,
+                                           ingredient=self.ingredient,
+                                           amount=10)
+        ShoppingList.objects.create(user=self.user, recipe=recipe)
+        self.recipe = recipe
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self):
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        return b''.join(response.streaming_content).decode()
+
+    def test_ingredient_rename_resets_cart(self):
+        self.assertIn('Соль', self.download())
+        self.ingredient.name = 'Соль морская'
+        self.ingredient.save()
+        self.assertIn('Соль морская', self.download())
+
+    def test_lost_version_gives_new_key(self):
+        cache.clear()
+        key = get_shopping_cart_key(self.user, 'txt')
+        invalidate_shopping_cart((self.user.id,))
+        # Версию вытеснили из кэша, а файл по старому ключу ещё жив.
+        cache.delete(SHOPPING_CART_VERSION_KEY.format(self.user.id))
+        self.assertNotEqual(get_shopping_cart_key(self.user, 'txt'), key)
+
+    def test_lost_recipe_version_gives_new_key(self):
+        cache.clear()
+        key = get_recipe_cache_key(self.recipe.pk, 'http://testserver/')
+        invalidate_recipes((self.recipe.pk,))
+        cache.delete(RECIPE_VERSION_KEY.format(self.recipe.pk))
+        self.assertNotEqual(
+            get_recipe_cache_key(self.recipe.pk, 'http://testserver/'), key
+        )
+
+    def test_recipe_cache_stats(self):
+        before = get_recipe_cache_stats()
+        for _ in range(2):
+            self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        after = get_recipe_cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+
+class FilterPlanTest(TestCase):
+    """Фильтры списка рецептов не читают таблицы целиком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        users = CustomUser.objects.bulk_create([
+            CustomUser(email=f'user{i}@example.com', username=f'user{i}',
+                       first_name='Имя', last_name='Фамилия')
+            for i in range(20)
+        ])
+        users = list(CustomUser.objects.order_by('id'))
+        Recipe.objects.bulk_create([
+            Recipe(name=f'Рецепт {i}', author=users[i % len(users)],
+                   text='Описание', cooking_time=10,
+                   image='recipe_images/test.png')
+            for i in range(3000)
+        ])
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=pk, tag_id=tags[pk % 3].id)
+            for pk in recipe_ids
+        ])
+        Favorite.objects.bulk_create([
+            Favorite(user=user, recipe_id=pk)
+            for user in users for pk in recipe_ids[:30]
+        ])
+        ShoppingList.objects.bulk_create([
+            ShoppingList(user=user, recipe_id=pk)
+            for user in users for pk in recipe_ids[-10:]
+        ])
+        cls.user = users[0]
+
+    def test_no_table_scans(self):
+        self.assertEqual(check(self.user), {})
@@ -1,17 +1,115 @@
-from recipes.models import IngredientContained
+import hashlib
+import threading
+from collections import Counter
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import IngredientContained, ShoppingList
+
+from .metrics import count_cache
+
+SHOPPING_CART_VERSION_KEY = 'shopping-cart-version:{}'
+SHOPPING_CART_RENDER_KEY = 'shopping-cart:{}:{}'
+SHOPPING_CART_TIMEOUT = 60 * 60 * 24
+RECIPE_VERSION_KEY = 'recipe-version:{}'
+RECIPE_DETAIL_KEY = 'recipe-detail:{}:{}:{}'
+RECIPE_DETAIL_TIMEOUT = 60 * 60 * 24
 
 
 def get_shopping_cart(user):
-    ingredients = IngredientContained.objects.filter(
-        recipe__shopping_cart__user=user.user
-    )
-    compressed_ingredients = {}
-    for ing in ingredients:
-        compressed_ingredients[
-            (ing.ingredient.name, ing.ingredient.measurement_unit)
-        ] += ing.amount
-    return ([
-        f"- {name}: {amount} {measurement_unit}\n"
-        for (name, measurement_unit), amount
-        in compressed_ingredients.items()
-    ])
+    return IngredientContained.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total=Sum('amount')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def get_shopping_cart_key(user, format):
+    """Ключ кэша, зависящий от содержимого списка покупок."""
+    recipes = ShoppingList.objects.filter(user=user).order_by(
+        'recipe_id'
+    ).values_list('recipe_id', flat=True)
+    version = get_version(SHOPPING_CART_VERSION_KEY.format(user.id))
+    contents = ','.join(map(str, recipes))
+    digest = hashlib.sha1(f'{version}:{contents}'.encode()).hexdigest()
+    return SHOPPING_CART_RENDER_KEY.format(user.id, f'{format}:{digest}')
+
+
+def cache_shopping_cart(key, chunks):
+    """Отдаёт файл по частям и сохраняет его в кэш после отрисовки."""
+    rendered = []
+    for chunk in chunks:
+        rendered.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(rendered), SHOPPING_CART_TIMEOUT)
+
+
+def get_version(key):
+    """Версия объекта для ключей кэша.
+
+    Пропавшая версия (например, вытесненная при очистке кэша) заменяется
+    новым уникальным значением, а не нулём: иначе она совпала бы с
+    версией ещё живых записей, сделанных до изменения объекта.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_versions(key_template, ids):
+    """Меняет версии объектов после фиксации транзакции."""
+    keys = [key_template.format(pk) for pk in set(ids)]
+
+    def bump():
+        cache.set_many({key: uuid4().hex for key in keys}, None)
+
+    transaction.on_commit(bump)
+
+
+def invalidate_shopping_cart(user_ids):
+    bump_versions(SHOPPING_CART_VERSION_KEY, user_ids)
+
+
+def get_recipe_cache_key(pk, base_url):
+    """Ключ общей для всех пользователей части ответа с рецептом.
+
+    Адрес сайта входит в ключ, так как ссылка на картинку абсолютная.
+    """
+    version = get_version(RECIPE_VERSION_KEY.format(pk))
+    site = hashlib.md5(base_url.encode()).hexdigest()[:8]
+    return RECIPE_DETAIL_KEY.format(pk, version, site)
+
+
+def invalidate_recipes(recipe_ids):
+    bump_versions(RECIPE_VERSION_KEY, recipe_ids)
+
+
+# Попадания считаются в памяти процесса: запись счётчика в общий кэш на
+# каждый запрос стоила бы дороже самого попадания. Сумма по всем воркерам
+# есть в /metrics (foodgram_cache_requests_total).
+recipe_cache_stats = Counter()
+recipe_cache_stats_lock = threading.Lock()
+
+
+def count_recipe_cache(hit):
+    count_cache('recipe-detail', hit)
+    with recipe_cache_stats_lock:
+        recipe_cache_stats['hits' if hit else 'misses'] += 1
+
+
+def get_recipe_cache_stats():
+    """Статистика кэша рецептов в текущем процессе."""
+    with recipe_cache_stats_lock:
+        hits = recipe_cache_stats['hits']
+        misses = recipe_cache_stats['misses']
+    total = hits + misses
+    return {'hits': hits, 'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None}
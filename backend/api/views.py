@@ -1,25 +1,42 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingList,
                             Tag)
+from recipes.search import ingredient_index
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (AllowAny, IsAuthenticated,
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from users.models import CustomUser
 
+from .exporters import SHOPPING_CART_EXPORTERS
 from .filters import IngredientFilter, RecipeFilter
-from .paginators import PageLimitPagination
+from .metrics import count_cache, registry
+from .mixins import CachedReadOnlyMixin
+from .paginators import KeysetPagination, PageLimitOrCursorPagination
+from .parsers import MultiPartJSONParser
 from .permissions import IsAuthorAdminOrReadOnly
 from .serializers import (CustomUserSerializer, FavoriteSerializer,
                           FollowSerializer, IngredientSerializer,
-                          RecipeCreateSerializer, RecipeSerializer,
-                          ShoppingListSerializer, TagSerializer)
-from .utils import get_shopping_cart
+                          RecipeCreateSerializer, RecipeIdsSerializer,
+                          RecipeSerializer, ShoppingListSerializer,
+                          TagSerializer)
+from .utils import (RECIPE_DETAIL_TIMEOUT, cache_shopping_cart,
+                    count_recipe_cache, get_recipe_cache_key,
+                    get_recipe_cache_stats, get_shopping_cart,
+                    get_shopping_cart_key)
 
 
 class CustomUserViewSet(UserViewSet):
@@ -32,14 +49,26 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated, )
     )
     def subscriptions(self, request):
-        queryset = CustomUser.objects.filter(followed__user=request.user)
-        if queryset:
-            pages = self.paginate_queryset(queryset)
-            serializer = FollowSerializer(pages, many=True,
-                                          context={'request': request})
-            return self.get_paginated_response(serializer.data)
-        return Response('У Вас нет подписок.',
-                        status=status.HTTP_400_BAD_REQUEST)
+        recipes = Recipe.objects.all()
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date', '-id').values('id')[
+                    :int(recipes_limit)
+                ]
+            ))
+        queryset = CustomUser.objects.filter(
+            followed__user=request.user
+        ).prefetch_related(Prefetch('recipes', queryset=recipes))
+        pages = self.paginate_queryset(queryset)
+        if not pages:
+            return Response('У Вас нет подписок.',
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = FollowSerializer(pages, many=True,
+                                      context={'request': request})
+        return self.get_paginated_response(serializer.data)
 
     @action(
         detail=True,
@@ -58,11 +87,11 @@ class CustomUserViewSet(UserViewSet):
         if subscription.exists():
             return Response(f'Вы уже подписаны на {author}',
                             status=status.HTTP_400_BAD_REQUEST)
-        subscribe = Follow.objects.create(
-            user=user,
-            author=author
-        )
-        subscribe.save()
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+            CustomUser.objects.filter(pk=author.pk).update(
+                followers_count=F('followers_count') + 1
+            )
         return Response(f'Вы подписались на {author}',
                         status=status.HTTP_201_CREATED)
 
@@ -73,56 +102,238 @@ class CustomUserViewSet(UserViewSet):
         change_subscription = Follow.objects.filter(
             user=user.id, author=author.id
         )
-        change_subscription.delete()
+        with transaction.atomic():
+            deleted, _ = change_subscription.delete()
+            if deleted:
+                CustomUser.objects.filter(pk=author.pk).update(
+                    followers_count=F('followers_count') - deleted
+                )
         return Response(f'Вы больше не подписаны на {author}',
                         status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedReadOnlyMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedReadOnlyMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     filter_backends = (DjangoFilterBackend, )
     filterset_class = IngredientFilter
-    search_fields = ('^name', )
     pagination_class = None
 
+    def get_limit(self):
+        limit = self.request.query_params.get('limit')
+        if limit and limit.isdigit() and int(limit) > 0:
+            return int(limit)
+        return None
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            return queryset[:self.get_limit()]
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_SEARCH_BACKEND == 'memory':
+            return Response(ingredient_index.search(name, self.get_limit()))
+        return super().list(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = PageLimitPagination
+    pagination_class = PageLimitOrCursorPagination
+    parser_classes = (JSONParser, MultiPartJSONParser)
+
+    def annotate_user_flags(self, queryset):
+        user = self.request.user
+        if user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return queryset.annotate(is_favorited=false,
+                                     is_in_shopping_cart=false,
+                                     is_author_subscribed=false)
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_author_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+
+    def get_queryset(self):
+        return self.annotate_user_flags(
+            Recipe.objects.select_related('author').prefetch_related(
+                'tags', 'ingredient_contained__ingredient'
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Общая часть рецепта берётся из кэша, флаги пользователя
+        дополняются одним запросом.
+
+        Проверка прав объекта не нужна: для чтения IsAuthorAdminOrReadOnly
+        разрешает доступ всем.
+        """
+        pk = str(kwargs[self.lookup_field])
+        if not pk.isdigit():
+            raise NotFound()
+        key = get_recipe_cache_key(pk, request.build_absolute_uri('/'))
+        data = cache.get(key)
+        count_recipe_cache(hit=data is not None)
+        if data is None:
+            recipe = get_object_or_404(
+                Recipe.objects.select_related('author').prefetch_related(
+                    'tags', 'ingredient_contained__ingredient'
+                ),
+                pk=pk
+            )
+            recipe.is_favorited = recipe.is_in_shopping_cart = False
+            recipe.is_author_subscribed = False
+            data = self.get_serializer(recipe).data
+            cache.set(key, data, RECIPE_DETAIL_TIMEOUT)
+        data = dict(data, author=dict(data['author']))
+        if not request.user.is_anonymous:
+            flags = self.annotate_user_flags(
+                Recipe.objects.filter(pk=pk)
+            ).values('is_favorited', 'is_in_shopping_cart',
+                     'is_author_subscribed').first()
+            if flags is None:
+                raise NotFound()
+            data['is_favorited'] = flags['is_favorited']
+            data['is_in_shopping_cart'] = flags['is_in_shopping_cart']
+            data['author']['is_subscribed'] = flags['is_author_subscribed']
+        return Response(data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAdminUser,),
+    )
+    def cache_stats(self, request):
+        return Response(get_recipe_cache_stats())
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed'):
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=KeysetPagination,
+    )
+    def feed(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author__in=Follow.objects.filter(
+                user=request.user
+            ).values('author')
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            CustomUser.objects.filter(pk=instance.author_id).update(
+                recipes_count=F('recipes_count') - 1
+            )
+
+    @staticmethod
+    def update_counter(model, ids, delta):
+        if model is Favorite and ids:
+            Recipe.objects.filter(pk__in=ids).update(
+                favorites_count=F('favorites_count') + delta
+            )
+
     @staticmethod
+    @transaction.atomic
     def create_object(request, pk, serializers):
         data = {'user': request.user.id, 'recipe': pk}
         serializer = serializers(data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        RecipeViewSet.update_counter(serializers.Meta.model, (pk,), 1)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
+    @transaction.atomic
     def delete_object(request, pk, model):
         user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
         object = get_object_or_404(model, user=user, recipe=recipe)
         object.delete()
+        RecipeViewSet.update_counter(model, (recipe.pk,), -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @staticmethod
+    def get_recipe_ids(request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        found = set(Recipe.objects.filter(pk__in=ids).values_list(
+            'id', flat=True
+        ))
+        return ids, found
+
+    @staticmethod
+    @transaction.atomic
+    def create_objects(request, model):
+        """Добавляет рецепты по одному через get_or_create: строку, которую
+        успел вставить параллельный запрос, не засчитываем как созданную.
+        Кэши и оценки обновляют сигналы post_save."""
+        user = request.user
+        ids, found = RecipeViewSet.get_recipe_ids(request)
+        existing = set(model.objects.filter(
+            user=user, recipe_id__in=found
+        ).values_list('recipe_id', flat=True))
+        created = set()
+        for pk in sorted(found - existing):
+            _, is_created = model.objects.get_or_create(user=user,
+                                                        recipe_id=pk)
+            if is_created:
+                created.add(pk)
+        RecipeViewSet.update_counter(model, created, 1)
+        return Response({'results': [
+            {'id': pk, 'status': 'not_found' if pk not in found
+             else 'created' if pk in created else 'exists'}
+            for pk in ids
+        ]})
+
+    @staticmethod
+    @transaction.atomic
+    def delete_objects(request, model):
+        user = request.user
+        ids, found = RecipeViewSet.get_recipe_ids(request)
+        existing = set(model.objects.filter(
+            user=user, recipe_id__in=found
+        ).values_list('recipe_id', flat=True))
+        model.objects.filter(user=user, recipe_id__in=existing).delete()
+        RecipeViewSet.update_counter(model, existing, -1)
+        return Response({'results': [
+            {'id': pk, 'status': 'not_found' if pk not in found
+             else 'deleted' if pk in existing else 'absent'}
+            for pk in ids
+        ]})
+
+    def _create_or_destroy_many(self, request, model):
+        if request.method == 'POST':
+            return self.create_objects(request, model)
+        return self.delete_objects(request, model)
+
     def _create_or_destroy(self, http_method, recipe, key,
                            model, serializer):
         if http_method == 'POST':
@@ -150,13 +361,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request.method, request, pk, ShoppingList, ShoppingListSerializer
         )
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_many(self, request):
+        return self._create_or_destroy_many(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_many(self, request):
+        return self._create_or_destroy_many(request, ShoppingList)
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_CART_EXPORTERS,
     )
-    def download_shopping_cart(self, user):
-        shopping_cart = get_shopping_cart(user)
-        filename = 'shopping-list.txt'
-        response = HttpResponse(shopping_cart, content_type='text/plain')
+    def download_shopping_cart(self, request):
+        exporter = request.accepted_renderer
+        key = get_shopping_cart_key(request.user, exporter.format)
+        shopping_cart = cache.get(key)
+        count_cache('shopping-cart', shopping_cart is not None)
+        if shopping_cart is None:
+            ingredients = get_shopping_cart(request.user).iterator()
+            shopping_cart = cache_shopping_cart(key,
+                                                exporter.stream(ingredients))
+        else:
+            shopping_cart = (shopping_cart,)
+        filename = f'shopping-list.{exporter.extension}'
+        response = StreamingHttpResponse(shopping_cart,
+                                         content_type=exporter.media_type)
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
+
+
+def metrics(request):
+    """Метрики всех процессов в формате Prometheus."""
+    if not settings.METRICS:
+        raise Http404
+    registry.flush(force=True)
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Пул соединений с базой, общий для потоков процесса.
+
+    Открывает не больше max_size соединений; соединение, простоявшее
+    дольше check_interval секунд, перед выдачей проверяется функцией
+    is_usable, а простоявшее дольше max_idle - закрывается.
+    """
+
+    def __init__(self, max_size, timeout, max_idle, check_interval,
+                 is_usable, close):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.is_usable = is_usable
+        self.close = close
+        self.condition = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.idle = deque()
+        self.size = 0
+
+    def check_fork(self):
+        # Соединения родителя после fork использовать нельзя, а закрывать
+        # их должен сам родитель.
+        if self.pid != os.getpid():
+            self.reset()
+
+    def reap(self):
+        now = time.monotonic()
+        while self.idle and now - self.idle[0][1] > self.max_idle:
+            connection, _ = self.idle.popleft()
+            self.size -= 1
+            self.close(connection)
+
+    def get(self, connect):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = returned = None
+            with self.condition:
+                self.check_fork()
+                self.reap()
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f'Все {self.max_size} соединений пула заняты '
+                            f'дольше {self.timeout} с'
+                        )
+                    self.condition.wait(remaining)
+                if self.idle:
+                    connection, returned = self.idle.pop()
+                else:
+                    self.size += 1
+            if connection is None:
+                try:
+                    return connect()
+                except Exception:
+                    self.discard(None)
+                    raise
+            if (time.monotonic() - returned < self.check_interval
+                    or self.is_usable(connection)):
+                return connection
+            self.discard(connection)
+
+    def put(self, connection):
+        with self.condition:
+            if self.pid != os.getpid():
+                return
+            self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, connection):
+        if connection is not None:
+            self.close(connection)
+        with self.condition:
+            if self.pid == os.getpid():
+                self.size -= 1
+                self.condition.notify()
@@ -0,0 +1,80 @@
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from ..pool import ConnectionPool
+
+Database = base.Database
+
+
+def is_usable(connection):
+    if connection.closed:
+        return False
+    try:
+        connection.cursor().execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+def close(connection):
+    try:
+        connection.close()
+    except Database.Error:
+        pass
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений на процесс.
+
+    Закрытое Django соединение (конец запроса при CONN_MAX_AGE = 0)
+    возвращается в пул и достаётся следующему запросу из любого потока.
+    Настройки - ключ POOL в DATABASES: MAX_SIZE, TIMEOUT, MAX_IDLE,
+    CHECK_INTERVAL.
+    """
+    pools = {}
+    pools_lock = threading.Lock()
+
+    def get_pool(self):
+        with self.pools_lock:
+            pool = self.pools.get(self.alias)
+            if pool is None:
+                options = self.settings_dict.get('POOL', {})
+                pool = self.pools[self.alias] = ConnectionPool(
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 30),
+                    max_idle=options.get('MAX_IDLE', 300),
+                    check_interval=options.get('CHECK_INTERVAL', 30),
+                    is_usable=is_usable,
+                    close=close,
+                )
+            return pool
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().get(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level',
+                                           connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection, pool = self.connection, self.get_pool()
+        usable = not connection.closed and (not self.errors_occurred
+                                            or is_usable(connection))
+        if usable and (connection.get_transaction_status()
+                       != extensions.TRANSACTION_STATUS_IDLE):
+            try:
+                connection.rollback()
+            except Database.Error:
+                usable = False
+        if usable:
+            pool.put(connection)
+        else:
+            pool.discard(connection)
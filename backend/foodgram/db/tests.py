@@ -0,0 +1,214 @@
+import threading
+import time
+from unittest import mock
+
+from django.db.backends.postgresql import base as postgresql
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from .pool import ConnectionPool, PoolTimeout
+from .postgresql.base import Database, DatabaseWrapper
+
+
+class FakeConnection:
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0
+
+    def monotonic(self):
+        return self.now
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def make_pool(self, max_size=2, timeout=0.05, max_idle=300,
+                  check_interval=30):
+        def close(connection):
+            connection.closed = True
+        return ConnectionPool(
+            max_size=max_size, timeout=timeout, max_idle=max_idle,
+            check_interval=check_interval,
+            is_usable=lambda connection: not connection.broken, close=close,
+        )
+
+    def test_max_size_and_timeout(self):
+        pool = self.make_pool()
+        pool.get(self.connect)
+        pool.get(self.connect)
+        started = time.monotonic()
+        with self.assertRaises(PoolTimeout):
+            pool.get(self.connect)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_reuse_and_handoff(self):
+        pool = self.make_pool(timeout=5)
+        first = pool.get(self.connect)
+        second = pool.get(self.connect)
+        pool.put(first)
+        self.assertIs(pool.get(self.connect), first)
+        received = []
+        waiter = threading.Thread(
+            target=lambda: received.append(pool.get(self.connect))
+        )
+        waiter.start()
+        pool.put(second)
+        waiter.join(5)
+        self.assertEqual(received, [second])
+        self.assertEqual(len(self.opened), 2)
+
+    def test_broken_connection_replaced(self):
+        clock = FakeTime()
+        with mock.patch('foodgram.db.pool.time', clock):
+            pool = self.make_pool(check_interval=30)
+            connection = pool.get(self.connect)
+            pool.put(connection)
+            connection.broken = True
+            # Недавно возвращённое соединение не проверяется.
+            self.assertIs(pool.get(self.connect), connection)
+            pool.put(connection)
+            clock.now += 31
+            replacement = pool.get(self.connect)
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_idle_connections_reaped(self):
+        clock = FakeTime()
+        with mock.patch('foodgram.db.pool.time', clock):
+            pool = self.make_pool(max_idle=300)
+            first = pool.get(self.connect)
+            second = pool.get(self.connect)
+            pool.put(first)
+            clock.now += 200
+            pool.put(second)
+            clock.now += 200
+            self.assertIs(pool.get(self.connect), second)
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_fork_resets_pool(self):
+        pool = self.make_pool()
+        connection = pool.get(self.connect)
+        pool.put(connection)
+        with mock.patch('foodgram.db.pool.os.getpid',
+                        return_value=pool.pid + 1):
+            child_connection = pool.get(self.connect)
+        # Соединение родителя в дочернем процессе не выдаётся и не
+        # закрывается: его закроет сам родитель.
+        self.assertIsNot(child_connection, connection)
+        self.assertFalse(connection.closed)
+        self.assertEqual(pool.size, 1)
+
+
+def make_connection(status=extensions.TRANSACTION_STATUS_IDLE):
+    connection = mock.Mock(closed=0, isolation_level=1)
+    connection.get_transaction_status.return_value = status
+    return connection
+
+
+class PooledDatabaseWrapperTest(SimpleTestCase):
+    settings_dict = {
+        'NAME': 'foodgram', 'USER': '', 'PASSWORD': '', 'HOST': '',
+        'PORT': '', 'OPTIONS': {}, 'TIME_ZONE': None, 'CONN_MAX_AGE': 0,
+        'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+        'POOL': {'MAX_SIZE': 1, 'TIMEOUT': 0.05},
+    }
+
+    def setUp(self):
+        pools = mock.patch.dict(DatabaseWrapper.pools, clear=True)
+        pools.start()
+        self.addCleanup(pools.stop)
+        self.wrapper = DatabaseWrapper(self.settings_dict, alias='pool')
+        self.pool = self.wrapper.get_pool()
+
+    def open(self, connection):
+        with mock.patch.object(postgresql.DatabaseWrapper,
+                               'get_new_connection',
+                               return_value=connection) as connect:
+            self.wrapper.connection = self.wrapper.get_new_connection(
+                {'database': 'foodgram'}
+            )
+        return connect
+
+    def test_pool_settings(self):
+        self.assertEqual(self.pool.max_size, 1)
+        self.assertEqual(self.pool.timeout, 0.05)
+        self.assertEqual(self.pool.max_idle, 300)
+        self.assertIs(DatabaseWrapper(self.settings_dict, alias='pool')
+                      .get_pool(), self.pool)
+
+    def test_connection_reused(self):
+        connection = make_connection()
+        connect = self.open(connection)
+        connect.assert_called_once_with({'database': 'foodgram'})
+        self.assertEqual(self.wrapper.isolation_level, 1)
+        self.wrapper._close()
+        connection.close.assert_not_called()
+        connect = self.open(make_connection())
+        connect.assert_not_called()
+        self.assertIs(self.wrapper.connection, connection)
+        self.assertEqual(self.pool.size, 1)
+
+    def test_pool_exhausted(self):
+        self.open(make_connection())
+        with self.assertRaises(PoolTimeout):
+            self.open(make_connection())
+
+    def test_open_transaction_rolled_back(self):
+        connection = make_connection(extensions.TRANSACTION_STATUS_INTRANS)
+        self.open(connection)
+        self.wrapper._close()
+        connection.rollback.assert_called_once_with()
+        self.assertEqual([item for item, _ in self.pool.idle], [connection])
+
+    def test_failed_rollback_discarded(self):
+        connection = make_connection(extensions.TRANSACTION_STATUS_INERROR)
+        connection.rollback.side_effect = Database.Error
+        self.open(connection)
+        self.wrapper._close()
+        connection.close.assert_called_once_with()
+        self.assertEqual(self.pool.size, 0)
+
+    def test_broken_after_errors_discarded(self):
+        connection = make_connection(extensions.TRANSACTION_STATUS_INERROR)
+        connection.cursor.return_value.execute.side_effect = Database.Error
+        self.open(connection)
+        self.wrapper.errors_occurred = True
+        self.wrapper._close()
+        connection.rollback.assert_not_called()
+        connection.close.assert_called_once_with()
+        self.assertEqual(self.pool.size, 0)
+
+    def test_usable_after_errors_returned(self):
+        connection = make_connection(extensions.TRANSACTION_STATUS_INERROR)
+        self.open(connection)
+        self.wrapper.errors_occurred = True
+        self.wrapper._close()
+        connection.cursor.return_value.execute.assert_called_once_with(
+            'SELECT 1'
+        )
+        connection.rollback.assert_called_once_with()
+        self.assertEqual(self.pool.size, 1)
+        self.assertEqual(len(self.pool.idle), 1)
+
+    def test_closed_connection_discarded(self):
+        connection = make_connection()
+        self.open(connection)
+        connection.closed = 1
+        self.wrapper._close()
+        self.assertEqual(self.pool.size, 0)
+        self.assertEqual(len(self.pool.idle), 0)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -74,7 +75,84 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='localhost'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+    }
+}
+
+# Пул соединений на процесс (только PostgreSQL): полезен при нескольких
+# потоках в процессе (gunicorn --threads, ASGI), где постоянное соединение
+# открывается на каждый поток.
+DB_POOL = os.getenv('DB_POOL', default='False').lower() in ('true', '1', 'yes')
+if DB_POOL and DATABASES['default']['ENGINE'].endswith('postgresql'):
+    DATABASES['default'].update({
+        'ENGINE': 'foodgram.db.postgresql',
+        # В конце запроса соединение возвращается в пул, а не закрывается.
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', default=10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=30)),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', default=300)),
+            'CHECK_INTERVAL': float(os.getenv(
+                'DB_POOL_CHECK_INTERVAL', default=30
+            )),
+        },
+    })
+
+# Автодополнение ингредиентов: 'database' использует индексы pg_trgm,
+# 'memory' - отсортированный индекс в памяти процесса.
+INGREDIENT_SEARCH_BACKEND = os.getenv(
+    'INGREDIENT_SEARCH_BACKEND',
+    default=('database' if 'postgresql' in DATABASES['default']['ENGINE']
+             else 'memory')
+)
+
+# Построить индекс ингредиентов при старте процесса, а не при первом поиске.
+INGREDIENT_INDEX_WARMUP = os.getenv(
+    'INGREDIENT_INDEX_WARMUP', default='False'
+).lower() in ('true', '1', 'yes')
+
+REQUEST_TIMING = os.getenv(
+    'REQUEST_TIMING', default='False'
+).lower() in ('true', '1', 'yes')
+REQUEST_TIMING_N_PLUS_ONE = int(os.getenv(
+    'REQUEST_TIMING_N_PLUS_ONE', default=3
+))
+if REQUEST_TIMING:
+    MIDDLEWARE.append('api.middleware.RequestTimingMiddleware')
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {'console': {'class': 'logging.StreamHandler'}},
+        'loggers': {
+            'foodgram.timing': {'handlers': ['console'], 'level': 'INFO'},
+        },
+    }
+
+METRICS = os.getenv('METRICS', default='False').lower() in ('true', '1', 'yes')
+METRICS_DIR = os.getenv(
+    'METRICS_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', default=1))
+if METRICS:
+    MIDDLEWARE.insert(0, 'api.middleware.MetricsMiddleware')
+
+# Кэш общий для всех процессов: воркеров gunicorn, обработчика картинок
+# и management-команд, иначе сброс версий в одном процессе не виден другим.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            default=os.path.join(tempfile.gettempdir(), 'foodgram-cache')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=10000)),
+        },
     }
 }
 
@@ -140,5 +218,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from .models import (Favorite, Follow, Ingredient, IngredientContained, Recipe,
-                     ShoppingList, Tag)
+from .models import (Favorite, Follow, ImageTask, Ingredient,
+                     IngredientContained, Recipe, ShoppingList, Tag)
 
 EMPTY_VALUE = '-пусто-'
 
@@ -39,11 +39,11 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = EMPTY_VALUE
 
     def is_favorited(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
     @staticmethod
     def amount_favorites(obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     @staticmethod
     def amount_tags(obj):
@@ -79,3 +79,12 @@ class ShoppingListAdmin(admin.ModelAdmin):
     list_filter = ('recipe', 'user')
     search_fields = ('user', )
     empty_value_display = '-пусто-'
+
+
+@admin.register(ImageTask)
+class ImageTaskAdmin(admin.ModelAdmin):
+    """Представляет очередь обработки фото в интерфейсе администратора."""
+    list_display = ('id', 'recipe', 'status', 'attempts', 'updated')
+    list_filter = ('status',)
+    readonly_fields = ('error',)
+    empty_value_display = EMPTY_VALUE
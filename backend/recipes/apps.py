@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecipesConfig(AppConfig):
     name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        if settings.INGREDIENT_INDEX_WARMUP:
+            from .search import ingredient_index
+            ingredient_index.warm()
@@ -0,0 +1,22 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+MODEL_VERSION_KEY = 'model-version:{}'
+
+
+def get_model_version(model):
+    """Версия данных модели: время последнего изменения в секундах."""
+    key = MODEL_VERSION_KEY.format(model._meta.label_lower)
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate_model_cache(model):
+    key = MODEL_VERSION_KEY.format(model._meta.label_lower)
+    transaction.on_commit(lambda: cache.set(key, time.time(), None))
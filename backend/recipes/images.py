@@ -0,0 +1,151 @@
+import io
+import logging
+import os
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from PIL import Image, ImageOps
+
+from .models import ImageTask, Recipe
+
+logger = logging.getLogger(__name__)
+
+MAX_SIZE = (1600, 1600)
+THUMBNAIL_SIZE = (480, 480)
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+MAX_ATTEMPTS = 3
+# Задача в статусе processing дольше этого срока считается брошенной
+# (например, воркер был остановлен) и забирается заново.
+PROCESSING_TIMEOUT = timedelta(minutes=10)
+
+
+def encode(image, format, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, quality=quality, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def save_file(field, name, content):
+    """Сохраняет файл под новым именем и возвращает прежнее имя.
+
+    Прежний файл не удаляется: на него ещё могут ссылаться рецепт в базе
+    и закэшированные ответы.
+    """
+    old_name = field.name
+    field.save(name, content, save=False)
+    return old_name
+
+
+def delete_files(storage, names):
+    for name in names:
+        if name:
+            storage.delete(name)
+
+
+def cache_is_shared():
+    """Сброс кэша рецептов из воркера виден веб-процессам."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def process_recipe_image(recipe):
+    """Ограничивает размер оригинала и создаёт миниатюру и WebP.
+
+    Поля рецепта сохраняются, только если за время обработки фото не
+    заменили и рецепт не удалили, иначе новые файлы удаляются.
+    """
+    if not recipe.image:
+        return
+    original = recipe.image.name
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info
+                              else 'RGB')
+    base = os.path.splitext(os.path.basename(original))[0]
+    old_names = {}
+    if image.width > MAX_SIZE[0] or image.height > MAX_SIZE[1]:
+        image.thumbnail(MAX_SIZE, Image.LANCZOS)
+        resized = image if image.mode == 'RGB' else image.convert('RGB')
+        old_names['image'] = save_file(
+            recipe.image, f'{base}.jpg', encode(resized, 'JPEG', JPEG_QUALITY)
+        )
+    old_names['image_webp'] = save_file(
+        recipe.image_webp, f'{base}.webp', encode(image, 'WEBP', WEBP_QUALITY)
+    )
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+    old_names['image_thumbnail'] = save_file(
+        recipe.image_thumbnail, f'{base}.webp',
+        encode(thumbnail, 'WEBP', WEBP_QUALITY)
+    )
+    new_names = [getattr(recipe, field).name for field in old_names]
+    with transaction.atomic():
+        current = Recipe.objects.select_for_update().filter(
+            pk=recipe.pk
+        ).values_list('image', flat=True).first()
+        if current == original:
+            recipe.save(update_fields=list(old_names))
+    storage = recipe.image.storage
+    if current != original:
+        delete_files(storage, new_names)
+    elif cache_is_shared():
+        # Иначе веб-процессы до истечения кэша отдают ответы со ссылками
+        # на прежние файлы, поэтому те остаются на диске.
+        delete_files(storage, set(old_names.values()) - set(new_names))
+
+
+def enqueue(recipe):
+    ImageTask.objects.filter(recipe=recipe, status=ImageTask.PENDING).delete()
+    return ImageTask.objects.create(recipe=recipe)
+
+
+def claim_task():
+    """Забирает следующую задачу из очереди.
+
+    Задача захватывается условным UPDATE, поэтому несколько воркеров
+    (потоков или процессов) не обработают её дважды.
+    """
+    stale = timezone.now() - PROCESSING_TIMEOUT
+    available = ImageTask.objects.filter(
+        Q(status=ImageTask.PENDING)
+        | Q(status=ImageTask.PROCESSING, updated__lt=stale)
+    )
+    for task in available.order_by('created')[:10]:
+        claimed = ImageTask.objects.filter(
+            pk=task.pk, status=task.status, updated=task.updated
+        ).update(status=ImageTask.PROCESSING, updated=timezone.now())
+        if claimed:
+            return ImageTask.objects.select_related('recipe').get(pk=task.pk)
+    return None
+
+
+def run_task(task):
+    task.attempts += 1
+    try:
+        process_recipe_image(task.recipe)
+    except Exception as error:
+        logger.exception('Не удалось обработать фото рецепта %s',
+                         task.recipe_id)
+        task.error = str(error)
+        task.status = (ImageTask.PENDING if task.attempts < MAX_ATTEMPTS
+                       else ImageTask.FAILED)
+    else:
+        task.error = ''
+        task.status = ImageTask.DONE
+    # Рецепт мог быть удалён во время обработки вместе с задачей:
+    # UPDATE по отсутствующей строке, в отличие от save(), не падает.
+    task.updated = timezone.now()
+    ImageTask.objects.filter(pk=task.pk).update(
+        status=task.status, attempts=task.attempts, error=task.error,
+        updated=task.updated,
+    )
+    return task
@@ -0,0 +1,632 @@
+import base64
+import csv
+import ctypes
+import gc
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from http.client import HTTPConnection
+from types import SimpleNamespace
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.client import (BOUNDARY, MULTIPART_CONTENT,
+                                encode_multipart)
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.urls import router_v1
+from recipes.models import (Favorite, Follow, Ingredient, IngredientContained,
+                            Recipe, ShoppingList, Tag)
+
+User = get_user_model()
+
+# Маршруты djoser для управления учётной записью (активация, смена пароля
+# и почты) отправляют письма и к рецептам отношения не имеют.
+SKIPPED_ROUTES = {
+    'users-activation', 'users-resend-activation', 'users-reset-password',
+    'users-reset-password-confirm', 'users-reset-username',
+    'users-reset-username-confirm', 'users-set-password',
+    'users-set-username',
+}
+# Абсолютный запас по задержке, чтобы не падать на шуме коротких запросов.
+LATENCY_NOISE_MS = 2
+# Фото больше FILE_UPLOAD_MAX_MEMORY_SIZE (2,5 МБ): multipart-загрузка
+# идёт через временный файл на диске, а не в память.
+PHOTO_SIZE = (2400, 1800)
+# Сценарии, для которых замеряется пиковый RSS процесса-сервера.
+RSS_SCENARIOS = ('recipes create photo base64',
+                 'recipes create photo multipart')
+TAGS = (('Завтрак', '#E26C2D', 'breakfast'),
+        ('Обед', '#49B64E', 'lunch'),
+        ('Ужин', '#8775D2', 'dinner'))
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def read_memory(field):
+    """Поле VmRSS/VmHWM из /proc/self/status, КиБ."""
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def reset_peak_memory():
+    """Отдаёт ОС свободную память кучи и сбрасывает пик RSS (Linux).
+
+    Иначе запрос переиспользовал бы память, освобождённую до fork, и пик
+    не вырос бы.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (AttributeError, OSError):
+        pass
+    with open('/proc/self/clear_refs', 'w') as file:
+        file.write('5')
+    return read_memory('VmRSS')
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный прогон всех маршрутов API на синтетических данных: "
+            "задержка, число запросов к базе и пик памяти")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument(
+            '--follows', type=int, default=5,
+            help='Подписок у каждого пользователя',
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=10,
+            help='Рецептов в избранном у каждого пользователя',
+        )
+        parser.add_argument(
+            '--cart', type=int, default=5,
+            help='Рецептов в списке покупок у каждого пользователя',
+        )
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.csv'),
+            help='Файл ингредиентов в формате .csv',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнять каждый сценарий',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Куда сохранить отчёт',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Отчёт, с которым сравнивать результаты',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Допустимый рост p50 и пика памяти относительно baseline',
+        )
+
+    def handle(self, **options):
+        if (options['repeat'] < 1 or options['users'] < 2
+                or options['recipes'] < 1):
+            raise CommandError(
+                'Нужны --repeat >= 1, --users >= 2 и --recipes >= 1'
+            )
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        media_root = tempfile.mkdtemp(prefix='benchmark-media-')
+        setup_test_environment()
+        # Данные создаются в отдельной тестовой базе, а кэш подменяется
+        # локальным, чтобы прогон не задел рабочие данные и кэш.
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with override_settings(MEDIA_ROOT=media_root, CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.'
+                               'LocMemCache',
+                    'LOCATION': 'benchmark',
+                },
+            }):
+                started = time.monotonic()
+                fixtures = self.seed(random.Random(options['seed']),
+                                     options)
+                self.stdout.write(
+                    f'Данные созданы за {time.monotonic() - started:.1f} с'
+                )
+                endpoints = self.run_scenarios(fixtures, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+        report = {
+            'database': connection.vendor,
+            'dataset': {key: options[key] for key in (
+                'users', 'recipes', 'follows', 'favorites', 'cart', 'seed'
+            )},
+            'repeat': options['repeat'],
+            'endpoints': endpoints,
+            'uncovered': self.get_uncovered(endpoints),
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(report)
+        self.stdout.write(f'Отчёт сохранён в {options["output"]}')
+        if baseline is not None:
+            self.compare(report, baseline, options['tolerance'])
+
+    def seed(self, rnd, options):
+        with open(options['ingredients'], encoding='utf-8') as file:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=row[0], measurement_unit=row[1])
+                 for row in csv.reader(file)],
+                ignore_conflicts=True,
+            )
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < 10:
+            raise CommandError('В файле ингредиентов меньше 10 строк')
+        Tag.objects.bulk_create([
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in TAGS
+        ])
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        password = make_password('benchmark')
+        User.objects.bulk_create([
+            User(email=f'user{i}@example.com', username=f'user{i}',
+                 first_name='Имя', last_name='Фамилия', password=password)
+            for i in range(options['users'])
+        ])
+        user_ids = list(User.objects.values_list('id', flat=True))
+        Recipe.objects.bulk_create([
+            Recipe(name=f'Рецепт {i}', author_id=rnd.choice(user_ids),
+                   text='Описание рецепта. ' * 20,
+                   cooking_time=rnd.randint(1, 180),
+                   image='recipe_images/benchmark.png')
+            for i in range(options['recipes'])
+        ])
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rnd.sample(tag_ids, rnd.randint(1, len(tag_ids)))
+        ])
+        IngredientContained.objects.bulk_create([
+            IngredientContained(recipe_id=recipe_id, ingredient_id=pk,
+                                amount=rnd.randint(1, 500))
+            for recipe_id in recipe_ids
+            for pk in rnd.sample(ingredient_ids, rnd.randint(3, 10))
+        ])
+        follows, favorites, carts = [], [], []
+        for user_id in user_ids:
+            authors = [pk for pk in user_ids if pk != user_id]
+            follows += [Follow(user_id=user_id, author_id=pk) for pk in
+                        rnd.sample(authors, min(options['follows'],
+                                                len(authors)))]
+            size = min(options['favorites'], len(recipe_ids))
+            favorites += [Favorite(user_id=user_id, recipe_id=pk)
+                          for pk in rnd.sample(recipe_ids, size)]
+            size = min(options['cart'], len(recipe_ids))
+            carts += [ShoppingList(user_id=user_id, recipe_id=pk)
+                      for pk in rnd.sample(recipe_ids, size)]
+        Follow.objects.bulk_create(follows)
+        Favorite.objects.bulk_create(favorites)
+        ShoppingList.objects.bulk_create(carts)
+        # Отдельный автор, на которого никто не подписан и рецепты которого
+        # никто не добавлял: на нём проверяются добавление и удаление.
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Автор', password='benchmark',
+        )
+        Recipe.objects.bulk_create([
+            Recipe(name=f'Новый рецепт {i}', author=author, text='Описание',
+                   cooking_time=10, image='recipe_images/benchmark.png')
+            for i in range(3)
+        ])
+        spare_ids = list(Recipe.objects.filter(author=author).values_list(
+            'id', flat=True
+        ))
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Админ', last_name='Админ', password='benchmark',
+        )
+        reader = User.objects.get(pk=user_ids[0])
+        own = Recipe.objects.filter(author=reader).first()
+        if own is None:
+            own = Recipe.objects.create(
+                name='Свой рецепт', author=reader, text='Описание',
+                cooking_time=5, image='recipe_images/benchmark.png',
+            )
+            own.tags.set(tag_ids[:1])
+        call_command('recount', stdout=io.StringIO())
+        call_command('refresh_scores', full=True, stdout=io.StringIO())
+        image = io.BytesIO()
+        Image.new('RGB', (64, 64), '#E26C2D').save(image, 'PNG')
+        # Фото размером с типичный снимок с телефона для сравнения
+        # загрузки в base64 и multipart.
+        photo = io.BytesIO()
+        Image.frombytes('RGB', PHOTO_SIZE, rnd.getrandbits(
+            PHOTO_SIZE[0] * PHOTO_SIZE[1] * 3 * 8
+        ).to_bytes(PHOTO_SIZE[0] * PHOTO_SIZE[1] * 3, 'big')).save(
+            photo, 'JPEG', quality=90
+        )
+        return {
+            'reader': reader, 'admin': admin, 'author': author,
+            'recipe': recipe_ids[len(recipe_ids) // 2], 'own': own,
+            'spare': spare_ids, 'tags': tag_ids,
+            'ingredients': ingredient_ids[:5],
+            'image': 'data:image/png;base64,'
+                     + base64.b64encode(image.getvalue()).decode(),
+            'photo': photo.getvalue(),
+        }
+
+    def get_scenarios(self, fixtures):
+        """Сценарии: шаги (метка, маршрут, клиент, метод, путь, данные
+        и, необязательно, формат запроса; по умолчанию json).
+
+        Шаги сценария выполняются по порядку и возвращают базу в исходное
+        состояние, поэтому каждый сценарий можно повторять. Путь и данные
+        могут быть функциями от ответа на предыдущий шаг.
+        """
+        recipe = fixtures['recipe']
+        own = fixtures['own'].id
+        author = fixtures['author'].id
+        spare = fixtures['spare']
+        ingredients = [{'id': pk, 'amount': 10}
+                       for pk in fixtures['ingredients']]
+        new_recipe = {
+            'name': 'Рецепт из бенчмарка', 'text': 'Описание',
+            'cooking_time': 15, 'tags': fixtures['tags'][:2],
+            'ingredients': ingredients, 'image': fixtures['image'],
+        }
+        photo_recipe = dict(new_recipe, image='data:image/jpeg;base64,'
+                            + base64.b64encode(fixtures['photo']).decode())
+
+        def multipart_recipe(response):
+            # Файл читается при кодировании запроса, поэтому на каждый
+            # запрос нужен новый.
+            return dict(
+                new_recipe, tags=json.dumps(new_recipe['tags']),
+                ingredients=json.dumps(ingredients),
+                image=SimpleUploadedFile('photo.jpg', fixtures['photo'],
+                                         'image/jpeg'),
+            )
+
+        def delete_created(response):
+            return f'/api/recipes/{response.data["id"]}/'
+
+        credentials = {'email': 'author@example.com',
+                       'password': 'benchmark'}
+        return [
+            [('users list', 'users-list', 'anon', 'get',
+              '/api/users/', None)],
+            [('users me', 'users-me', 'reader', 'get',
+              '/api/users/me/', None)],
+            [('users detail', 'users-detail', 'reader', 'get',
+              f'/api/users/{author}/', None)],
+            [('users subscriptions', 'users-subscriptions', 'reader', 'get',
+              '/api/users/subscriptions/?recipes_limit=3', None)],
+            [('users subscribe', 'users-subscribe', 'reader', 'post',
+              f'/api/users/{author}/subscribe/', None),
+             ('users unsubscribe', 'users-subscribe', 'reader', 'delete',
+              f'/api/users/{author}/subscribe/', None)],
+            [('auth token login', 'login', 'anon', 'post',
+              '/api/auth/token/login/', credentials),
+             ('auth token logout', 'logout', 'token', 'post',
+              '/api/auth/token/logout/', None)],
+            [('tags list', 'tags-list', 'anon', 'get', '/api/tags/', None)],
+            [('tags detail', 'tags-detail', 'anon', 'get',
+              f'/api/tags/{fixtures["tags"][0]}/', None)],
+            [('ingredients list', 'ingredients-list', 'anon', 'get',
+              '/api/ingredients/', None)],
+            [('ingredients search', 'ingredients-list', 'anon', 'get',
+              '/api/ingredients/?name=соль', None)],
+            [('ingredients detail', 'ingredients-detail', 'anon', 'get',
+              f'/api/ingredients/{fixtures["ingredients"][0]}/', None)],
+            [('recipes list anon', 'recipes-list', 'anon', 'get',
+              '/api/recipes/', None)],
+            [('recipes list', 'recipes-list', 'reader', 'get',
+              '/api/recipes/?limit=20', None)],
+            *self.get_tag_scenarios(),
+            [('recipes list popular', 'recipes-list', 'reader', 'get',
+              '/api/recipes/?ordering=popular', None)],
+            [('recipes list favorited', 'recipes-list', 'reader', 'get',
+              '/api/recipes/?is_favorited=1&is_in_shopping_cart=1', None)],
+            [('recipes list cursor', 'recipes-list', 'reader', 'get',
+              '/api/recipes/?cursor=', None)],
+            [('recipes feed', 'recipes-feed', 'reader', 'get',
+              '/api/recipes/feed/', None)],
+            [('recipes detail', 'recipes-detail', 'reader', 'get',
+              f'/api/recipes/{recipe}/', None)],
+            [('recipes create', 'recipes-list', 'reader', 'post',
+              '/api/recipes/', new_recipe),
+             ('recipes delete', 'recipes-detail', 'reader', 'delete',
+              delete_created, None)],
+            [('recipes create photo base64', 'recipes-list', 'reader',
+              'post', '/api/recipes/', photo_recipe),
+             ('recipes delete photo base64', 'recipes-detail', 'reader',
+              'delete', delete_created, None)],
+            [('recipes create photo multipart', 'recipes-list', 'reader',
+              'post', '/api/recipes/', multipart_recipe, 'multipart'),
+             ('recipes delete photo multipart', 'recipes-detail', 'reader',
+              'delete', delete_created, None)],
+            [('recipes update', 'recipes-detail', 'reader', 'patch',
+              f'/api/recipes/{own}/', {'text': 'Новое описание'})],
+            [('recipes favorite', 'recipes-favorite', 'reader', 'post',
+              f'/api/recipes/{spare[0]}/favorite/', None),
+             ('recipes unfavorite', 'recipes-favorite', 'reader', 'delete',
+              f'/api/recipes/{spare[0]}/favorite/', None)],
+            [('recipes cart add', 'recipes-shopping-cart', 'reader', 'post',
+              f'/api/recipes/{spare[0]}/shopping_cart/', None),
+             ('recipes cart remove', 'recipes-shopping-cart', 'reader',
+              'delete', f'/api/recipes/{spare[0]}/shopping_cart/', None)],
+            [('recipes favorite many', 'recipes-favorite-many', 'reader',
+              'post', '/api/recipes/favorite/', {'recipes': spare}),
+             ('recipes unfavorite many', 'recipes-favorite-many', 'reader',
+              'delete', '/api/recipes/favorite/', {'recipes': spare})],
+            [('recipes cart add many', 'recipes-shopping-cart-many',
+              'reader', 'post', '/api/recipes/shopping_cart/',
+              {'recipes': spare}),
+             ('recipes cart remove many', 'recipes-shopping-cart-many',
+              'reader', 'delete', '/api/recipes/shopping_cart/',
+              {'recipes': spare})],
+            [('download shopping cart', 'recipes-download-shopping-cart',
+              'reader', 'get', '/api/recipes/download_shopping_cart/', None)],
+            [('download shopping cart pdf',
+              'recipes-download-shopping-cart', 'reader', 'get',
+              '/api/recipes/download_shopping_cart/?format=pdf', None)],
+            [('recipes cache stats', 'recipes-cache-stats', 'admin', 'get',
+              '/api/recipes/cache_stats/', None)],
+            [('api root', 'api-root', 'anon', 'get', '/api/', None)],
+        ]
+
+    @staticmethod
+    def get_tag_scenarios():
+        """Фильтр по 1, 2 и 3 тегам в режимах «любой» и «все сразу»:
+        задержка не должна расти с числом тегов."""
+        scenarios = []
+        for mode in ('', 'and'):
+            for count in range(1, len(TAGS) + 1):
+                query = '&'.join(f'tags={slug}' for _, _, slug in
+                                 TAGS[:count])
+                label = f'recipes list tags {count}'
+                if mode:
+                    query += f'&tags_mode={mode}'
+                    label += f' {mode}'
+                scenarios.append([(label, 'recipes-list', 'reader', 'get',
+                                   f'/api/recipes/?{query}', None)])
+        return scenarios
+
+    def get_clients(self, fixtures):
+        clients = {'anon': APIClient(), 'token': APIClient()}
+        self.tokens = {}
+        for name in ('reader', 'admin'):
+            token, _ = Token.objects.get_or_create(user=fixtures[name])
+            self.tokens[name] = token.key
+            clients[name] = APIClient()
+            clients[name].credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return clients
+
+    def send(self, clients, step, previous):
+        label, route, client, method, path, data, *format = step
+        if callable(path):
+            path = path(previous)
+        if callable(data):
+            data = data(previous)
+        if client == 'token':
+            clients['token'].credentials(
+                HTTP_AUTHORIZATION=f'Token {previous.data["auth_token"]}'
+            )
+        response = getattr(clients[client], method)(
+            path, data, format=format[0] if format else 'json'
+        )
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        return response
+
+    def send_http(self, port, step, previous):
+        """Шаг сценария настоящим HTTP-запросом к серверу ``measure_rss``."""
+        label, route, client, method, path, data, *format = step
+        if callable(path):
+            path = path(previous)
+        if callable(data):
+            data = data(previous)
+        headers = {'Host': 'testserver'}
+        if client in self.tokens:
+            headers['Authorization'] = f'Token {self.tokens[client]}'
+        body = None
+        if data is not None:
+            if format and format[0] == 'multipart':
+                body = encode_multipart(BOUNDARY, data)
+                headers['Content-Type'] = MULTIPART_CONTENT
+            else:
+                body = json.dumps(data).encode()
+                headers['Content-Type'] = 'application/json'
+        http = HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            http.request(method.upper(), path, body, headers)
+            response = http.getresponse()
+            content = response.read()
+        finally:
+            http.close()
+        is_json = 'json' in (response.getheader('Content-Type') or '')
+        return SimpleNamespace(status_code=response.status,
+                               data=json.loads(content) if is_json else None)
+
+    def measure_rss(self, scenario):
+        """Прирост пикового RSS сервера на каждом шаге сценария, КиБ.
+
+        Запросы обслуживает wsgiref в дочернем процессе, а тело запроса
+        собирается в родительском, поэтому пик RSS ребёнка учитывает
+        только разбор запроса и работу представления.
+        """
+        server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                             handler_class=QuietHandler)
+        server.timeout = 60
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            try:
+                if not connection.is_in_memory_db():
+                    # Соединение родителя ребёнку использовать нельзя.
+                    connection.connection = None
+                usage = {}
+                for step in scenario:
+                    before = reset_peak_memory()
+                    server.handle_request()
+                    usage[step[0]] = read_memory('VmHWM') - before
+                os.write(write, json.dumps(usage).encode())
+            finally:
+                os._exit(0)
+        os.close(write)
+        port = server.server_port
+        server.server_close()
+        try:
+            previous = None
+            for step in scenario:
+                previous = self.send_http(port, step, previous)
+        finally:
+            with os.fdopen(read) as file:
+                usage = file.read()
+            os.waitpid(pid, 0)
+        return json.loads(usage) if usage else {}
+
+    def run_scenarios(self, fixtures, repeat):
+        clients = self.get_clients(fixtures)
+        results = {}
+        for scenario in self.get_scenarios(fixtures):
+            timings = {step[0]: [] for step in scenario}
+            queries, statuses, peaks = {}, {}, {}
+            # Первый проход прогревает кэши, последний считает пик памяти:
+            # tracemalloc заметно замедляет запросы.
+            for iteration in range(repeat + 2):
+                traced = iteration == repeat + 1
+                previous = None
+                for step in scenario:
+                    label = step[0]
+                    if traced:
+                        tracemalloc.start()
+                    with CaptureQueriesContext(connection) as context:
+                        started = time.perf_counter()
+                        previous = self.send(clients, step, previous)
+                        elapsed = time.perf_counter() - started
+                    if traced:
+                        peaks[label] = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                    elif iteration:
+                        timings[label].append(elapsed * 1000)
+                    queries[label] = len(context.captured_queries)
+                    statuses[label] = previous.status_code
+            rss = {}
+            if (scenario[0][0] in RSS_SCENARIOS
+                    and os.path.exists('/proc/self/clear_refs')):
+                rss = self.measure_rss(scenario)
+            for step in scenario:
+                label = step[0]
+                results[label] = {
+                    'route': step[1],
+                    'method': step[3].upper(),
+                    'status': statuses[label],
+                    'p50_ms': round(statistics.median(timings[label]), 3),
+                    'p95_ms': round(percentile(timings[label], 0.95), 3),
+                    'queries': queries[label],
+                    'peak_kib': round(peaks[label] / 1024, 1),
+                }
+                if label in rss:
+                    results[label]['server_rss_kib'] = rss[label]
+        return results
+
+    @staticmethod
+    def get_uncovered(endpoints):
+        routes = {url.name for url in router_v1.urls}
+        covered = {result['route'] for result in endpoints.values()}
+        return sorted(routes - covered - SKIPPED_ROUTES)
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"endpoint":<34}{"status":>7}{"p50, ms":>10}{"p95, ms":>10}'
+            f'{"queries":>9}{"peak, KiB":>11}'
+        )
+        for label, result in report['endpoints'].items():
+            line = (f'{label:<34}{result["status"]:>7}'
+                    f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+                    f'{result["queries"]:>9}{result["peak_kib"]:>11.1f}')
+            if result['status'] >= 400:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
+        for label, result in report['endpoints'].items():
+            if 'server_rss_kib' in result:
+                self.stdout.write(f'{label}: прирост пикового RSS сервера '
+                                  f'{result["server_rss_kib"]} КиБ')
+        if report['uncovered']:
+            self.stdout.write(self.style.WARNING(
+                f'Маршруты без сценария: {", ".join(report["uncovered"])}'
+            ))
+
+    def compare(self, report, baseline, tolerance):
+        regressions = []
+        for label, result in report['endpoints'].items():
+            before = baseline.get('endpoints', {}).get(label)
+            if before is None:
+                continue
+            if result['status'] != before['status']:
+                regressions.append(
+                    f'{label}: статус {before["status"]} -> '
+                    f'{result["status"]}'
+                )
+            if result['queries'] > before['queries']:
+                regressions.append(
+                    f'{label}: запросов {before["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            # p95 на малом числе повторов шумит, поэтому сравнивается медиана.
+            limit = before['p50_ms'] * (1 + tolerance) + LATENCY_NOISE_MS
+            if result['p50_ms'] > limit:
+                regressions.append(
+                    f'{label}: p50 {before["p50_ms"]} -> {result["p50_ms"]} мс'
+                )
+            if result['peak_kib'] > before['peak_kib'] * (1 + tolerance):
+                regressions.append(
+                    f'{label}: память {before["peak_kib"]} -> '
+                    f'{result["peak_kib"]} КиБ'
+                )
+        if report['dataset'] != baseline.get('dataset'):
+            self.stdout.write(self.style.WARNING(
+                'Набор данных отличается от baseline: сравнение неточное'
+            ))
+        if regressions:
+            raise CommandError('Регрессии относительно baseline:\n'
+                               + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,98 @@
+import itertools
+import re
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import QueryDict
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(
+        r'\bSCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)'
+    ),
+}
+# Подзапросы Django обращаются к таблицам через псевдонимы вида
+# "recipes_recipe_tags" U0, а SQLite в плане называет только псевдоним.
+TABLE_ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+DEFAULT_IGNORE = ('recipes_tag',)
+
+User = get_user_model()
+
+
+def get_filters(user):
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    options = {
+        'tags': [tags[:count] for count in range(len(tags) + 1)],
+        'author': [None, user.id],
+        'is_favorited': [None, '1'],
+        'is_in_shopping_cart': [None, '1'],
+    }
+    for values in itertools.product(*options.values()):
+        data = QueryDict(mutable=True)
+        for name, value in zip(options, values):
+            if isinstance(value, list):
+                data.setlist(name, value)
+            elif value is not None:
+                data[name] = value
+        yield data
+
+
+def get_scanned_tables(queryset):
+    """Таблицы, которые план запроса читает целиком."""
+    pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        raise CommandError(f'СУБД {connection.vendor} не поддерживается')
+    sql, _ = queryset.query.sql_with_params()
+    aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+    return {aliases.get(name, name)
+            for name in pattern.findall(queryset.explain())}
+
+
+def check(user, ignore=DEFAULT_IGNORE):
+    """Сканирования таблиц для всех сочетаний фильтров:
+    {параметры запроса: [таблицы]}; пустые результаты не включаются."""
+    request = SimpleNamespace(user=user)
+    scans = {}
+    for data in get_filters(user):
+        queryset = RecipeFilter(data=data, queryset=Recipe.objects.all(),
+                                request=request).qs[:6]
+        tables = sorted(get_scanned_tables(queryset) - set(ignore))
+        if tables:
+            scans[data.urlencode() or '(без фильтров)'] = tables
+    return scans
+
+
+class Command(BaseCommand):
+    help = ("EXPLAIN для всех сочетаний фильтров RecipeFilter: "
+            "поиск последовательных сканирований")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-seq-scan', action='store_true',
+            help='Завершиться с ошибкой, если найдено сканирование таблицы',
+        )
+        parser.add_argument(
+            '--ignore', nargs='*', default=DEFAULT_IGNORE,
+            help='Таблицы-справочники, сканирование которых допустимо',
+        )
+
+    def handle(self, fail_on_seq_scan, ignore, **kwargs):
+        user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('В базе нет пользователей: заполните её')
+        scans = check(user, ignore)
+        for label, tables in scans.items():
+            self.stdout.write(self.style.WARNING(
+                f'{label}: сканирование {", ".join(tables)}'
+            ))
+        if not scans:
+            self.stdout.write('Сканирований таблиц нет')
+        elif fail_on_seq_scan:
+            raise CommandError(
+                f'Последовательные сканирования в {len(scans)} запросах'
+            )
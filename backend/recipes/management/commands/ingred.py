@@ -1,27 +1,83 @@
 import csv
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from recipes.cache import invalidate_model_cache
 from recipes.models import Ingredient
 
+BATCH_SIZE = 500
+
 
 class Command(BaseCommand):
     help = "Импорт ингредиентов в базу данных"
 
-    def handle(self, **kwargs):
-        with open(
-            os.path.join(settings.BASE_DIR, "ingredients.csv"),
-            "r",
-            encoding="UTF-8"
-        ) as file:
-            reader = csv.reader(file, delimiter=",")
-            for row in reader:
-                Ingredient.objects.get_or_create(
-                    name=row[0],
-                    measurement_unit=row[1]
-                )
-        self.stdout.write(
-            self.style.SUCCESS("[+]***Ingredients were succesfully loaded***")
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.csv'),
+            help='Путь к файлу ингредиентов (.csv или .json)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество строк в одной пачке bulk_create',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Прочитать файл, ничего не записывая в базу',
         )
+
+    @staticmethod
+    def read_csv(file):
+        for row in csv.reader(file, delimiter=","):
+            yield row[0], row[1]
+
+    @staticmethod
+    def read_json(file):
+        for item in json.load(file):
+            yield item['name'], item['measurement_unit']
+
+    def handle(self, path, batch_size, dry_run, **kwargs):
+        readers = {'.csv': self.read_csv, '.json': self.read_json}
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in readers:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        count_before = Ingredient.objects.count()
+        processed = 0
+        started = time.monotonic()
+        with open(path, "r", encoding="UTF-8") as file:
+            rows = readers[extension](file)
+            while True:
+                batch = [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in islice(rows, batch_size)
+                ]
+                if not batch:
+                    break
+                if not dry_run:
+                    Ingredient.objects.bulk_create(batch,
+                                                   ignore_conflicts=True)
+                processed += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Обработано строк: {processed} '
+                    f'({processed / max(elapsed, 1e-6):.0f} строк/с)'
+                )
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'[dry-run] Прочитано {processed} строк, база не изменена'
+            ))
+            return
+        created = Ingredient.objects.count() - count_before
+        if created:
+            invalidate_model_cache(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f"[+]***Ingredients were succesfully loaded*** "
+            f"(новых: {created}, пропущено: {processed - created})"
+        ))
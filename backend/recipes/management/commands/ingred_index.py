@@ -0,0 +1,49 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.search import ingredient_index
+
+
+class Command(BaseCommand):
+    help = "Размер и скорость индекса ингредиентов в памяти"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookups', type=int, default=1000,
+            help='Количество поисковых запросов для замера',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Ограничение количества результатов одного запроса',
+        )
+
+    def handle(self, lookups, limit, **kwargs):
+        started = time.perf_counter()
+        ingredient_index.build()
+        build_time = time.perf_counter() - started
+        stats = ingredient_index.stats()
+        names = [item['name'] for item in ingredient_index.search('')]
+        if not names:
+            self.stdout.write(self.style.WARNING('Индекс пуст'))
+            return
+        queries = [
+            name[:random.randint(1, min(len(name), 4))]
+            for name in random.choices(names, k=lookups)
+        ]
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            ingredient_index.search(query, limit)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        self.stdout.write(
+            f"Записей: {stats['entries']}\n"
+            f"Память: {stats['memory'] / 1024:.1f} КБ\n"
+            f"Построение: {build_time * 1000:.1f} мс\n"
+            f"Поиск, мкс: p50={statistics.median(timings):.1f} "
+            f"p95={timings[int(len(timings) * 0.95) - 1]:.1f} "
+            f"max={timings[-1]:.1f}"
+        )
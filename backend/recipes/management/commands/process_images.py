@@ -0,0 +1,65 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from recipes.images import claim_task, run_task
+from recipes.models import ImageTask
+
+logger = logging.getLogger('recipes.images')
+
+
+class Command(BaseCommand):
+    help = "Фоновая обработка фото рецептов из очереди ImageTask"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Количество потоков-обработчиков',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и завершиться',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Пауза в секундах, если очередь пуста',
+        )
+
+    def work(self, once, poll_interval):
+        processed = 0
+        try:
+            while True:
+                task = claim_task()
+                if task is None:
+                    if once:
+                        return processed
+                    time.sleep(poll_interval)
+                    continue
+                try:
+                    task = run_task(task)
+                except DatabaseError:
+                    # Поток не должен молча завершаться: handle ждёт все
+                    # потоки. Задача вернётся в очередь по PROCESSING_TIMEOUT.
+                    logger.exception('Ошибка базы при обработке задачи %s',
+                                     task.pk)
+                    connection.close()
+                    time.sleep(poll_interval)
+                    continue
+                processed += 1
+                style = (self.style.SUCCESS if task.status == ImageTask.DONE
+                         else self.style.WARNING)
+                self.stdout.write(style(
+                    f'Рецепт {task.recipe_id}: {task.get_status_display()}'
+                ))
+        finally:
+            connection.close()
+
+    def handle(self, workers, once, poll_interval, **kwargs):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self.work, once, poll_interval)
+                       for _ in range(workers)]
+            processed = sum(future.result() for future in futures)
+        self.stdout.write(f'Обработано задач: {processed}')
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Follow, Recipe
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = "Пересчёт денормализованных счётчиков рецептов и пользователей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не исправляя',
+        )
+
+    def handle(self, dry_run, **kwargs):
+        for model, field, related_model, related_field in COUNTERS:
+            actual = Coalesce(Subquery(
+                related_model.objects.filter(
+                    **{related_field: OuterRef('pk')}
+                ).order_by().values(related_field).annotate(
+                    total=Count('pk')
+                ).values('total')
+            ), 0)
+            drift = model.objects.annotate(actual=actual).exclude(
+                **{field: F('actual')}
+            ).count()
+            if drift and not dry_run:
+                model.objects.update(**{field: actual})
+            label = f'{model._meta.verbose_name_plural}.{field}'
+            if drift:
+                self.stdout.write(self.style.WARNING(
+                    f'{label}: расхождений {drift}'
+                    + ('' if dry_run else ', исправлено')
+                ))
+            else:
+                self.stdout.write(f'{label}: OK')
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe, RecipeScore
+from recipes.scores import refresh_scores
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ("Пересчёт популярности рецептов, у которых изменились "
+            "избранное или списки покупок")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество рецептов в одной пачке',
+        )
+
+    def handle(self, full, batch_size, **kwargs):
+        started = time.monotonic()
+        RecipeScore.objects.bulk_create(
+            [RecipeScore(recipe_id=pk) for pk in Recipe.objects.filter(
+                popularity__isnull=True
+            ).values_list('id', flat=True).iterator()],
+            ignore_conflicts=True,
+        )
+        scores = RecipeScore.objects.all()
+        if not full:
+            scores = scores.filter(stale=True)
+        recipe_ids = list(scores.values_list('recipe_id', flat=True))
+        refreshed = 0
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = recipe_ids[start:start + batch_size]
+            # Флаг снимается до расчёта: изменения, пришедшие во время
+            # пересчёта, снова пометят рецепт и попадут в следующий запуск.
+            RecipeScore.objects.filter(recipe_id__in=batch).update(
+                stale=False
+            )
+            refreshed += refresh_scores(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {refreshed} '
+            f'за {time.monotonic() - started:.2f} с'
+        ))
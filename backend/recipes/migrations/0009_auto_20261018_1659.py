@@ -0,0 +1,57 @@
+# Generated by Django 2.2.19 on 2026-10-18 16:59
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientContained = apps.get_model('recipes', 'IngredientContained')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        extra = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=duplicate['keep_id'])
+        IngredientContained.objects.filter(ingredient__in=extra).update(
+            ingredient_id=duplicate['keep_id']
+        )
+        extra.delete()
+    # После замены в рецепте могут оказаться две строки одного
+    # ингредиента: оставляем одну с суммарным количеством.
+    collisions = IngredientContained.objects.values(
+        'recipe', 'ingredient'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id'), total_amount=Sum('amount')
+    ).filter(total__gt=1).order_by()
+    for collision in collisions:
+        IngredientContained.objects.filter(id=collision['keep_id']).update(
+            amount=collision['total_amount']
+        )
+        IngredientContained.objects.filter(
+            recipe=collision['recipe'], ingredient=collision['ingredient'],
+        ).exclude(id=collision['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_auto_20221220_1337'),
+    ]
+
+    operations = [
+        # Ограничение (ingredient, amount) из 0001 мешает объединению:
+        # перенос строк на оставшийся ингредиент может его нарушить.
+        migrations.RemoveConstraint(
+            model_name='ingredientcontained',
+            name='unique_ingredient_amount',
+        ),
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
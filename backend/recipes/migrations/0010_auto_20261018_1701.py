@@ -0,0 +1,38 @@
+# Generated by Django 2.2.19 on 2026-10-18 17:01
+
+from django.db import migrations
+
+# Django генерирует для istartswith/icontains выражение UPPER("name"::text),
+# поэтому индексы строятся по тому же выражению.
+CREATE_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_prefix '
+    'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm '
+    'ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS recipes_ingredient_name_trgm',
+    'DROP INDEX IF EXISTS recipes_ingredient_name_prefix',
+)
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_auto_20261018_1659'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE_INDEXES),
+                             run_on_postgresql(DROP_INDEXES)),
+    ]
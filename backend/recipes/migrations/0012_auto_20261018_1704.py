@@ -0,0 +1,39 @@
+# Generated by Django 2.2.19 on 2026-10-18 17:04
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicates(model_name, fields):
+    def run(apps, schema_editor):
+        model = apps.get_model('recipes', model_name)
+        duplicates = model.objects.values(*fields).annotate(
+            keep_id=Min('id'), total=Count('id')
+        ).filter(total__gt=1).order_by()
+        for duplicate in duplicates:
+            keep_id = duplicate.pop('keep_id')
+            duplicate.pop('total')
+            model.objects.filter(**duplicate).exclude(id=keep_id).delete()
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_auto_20261018_1703'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicates('ShoppingList', ('user', 'recipe')),
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientcontained',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_list'),
+        ),
+    ]
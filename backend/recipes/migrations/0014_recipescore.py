@@ -0,0 +1,26 @@
+# Generated by Django 2.2.19 on 2026-10-18 17:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='recipes.Recipe', verbose_name='Рецепт')),
+                ('score', models.FloatField(db_index=True, default=0, verbose_name='Популярность')),
+                ('stale', models.BooleanField(db_index=True, default=True, verbose_name='Требует пересчёта')),
+            ],
+            options={
+                'verbose_name': 'Популярность рецепта',
+                'verbose_name_plural': 'Популярность рецептов',
+            },
+        ),
+    ]
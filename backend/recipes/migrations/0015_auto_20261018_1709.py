@@ -0,0 +1,45 @@
+# Generated by Django 2.2.19 on 2026-10-18 17:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipescore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, help_text='Создаётся фоновой обработкой фото', upload_to='recipe_images/thumbnails/', verbose_name='Миниатюра'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, editable=False, help_text='Создаётся фоновой обработкой фото', upload_to='recipe_images/webp/', verbose_name='Фото в WebP'),
+        ),
+        migrations.CreateModel(
+            name='ImageTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_tasks', to='recipes.Recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Обработка фото',
+                'verbose_name_plural': 'Обработка фото',
+                'ordering': ('created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='imagetask',
+            index=models.Index(fields=['status', 'created'], name='image_task_status_idx'),
+        ),
+    ]
@@ -50,6 +50,12 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit',),
+                name='unique_ingredient_name_unit',
+            ),
+        )
 
 
 class Recipe(models.Model):
@@ -76,6 +82,18 @@ class Recipe(models.Model):
         blank=True,
         verbose_name='Фото блюда',
         help_text='Загрузите фото',)
+    image_thumbnail = models.ImageField(
+        upload_to='recipe_images/thumbnails/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра',
+        help_text='Создаётся фоновой обработкой фото',)
+    image_webp = models.ImageField(
+        upload_to='recipe_images/webp/',
+        blank=True,
+        editable=False,
+        verbose_name='Фото в WebP',
+        help_text='Создаётся фоновой обработкой фото',)
     ingredients = models.ManyToManyField(
         to=Ingredient,
         through='IngredientContained',
@@ -91,11 +109,22 @@ class Recipe(models.Model):
     )],
         verbose_name='Время приготовления',
         help_text='Укажите время приготовления',)
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+        help_text='Обновляется при добавлении и удалении из избранного',)
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_author_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -128,8 +157,8 @@ class IngredientContained(models.Model):
         verbose_name_plural = 'Содержание ингредиентов'
         constraints = (
             models.UniqueConstraint(
-                fields=('ingredient', 'amount',),
-                name='unique_ingredient_amount',
+                fields=('recipe', 'ingredient',),
+                name='unique_recipe_ingredient',
             ),
         )
 
@@ -180,6 +209,11 @@ class ShoppingList(models.Model):
     class Meta:
         verbose_name = 'Покупка'
         verbose_name_plural = 'Покупки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_shopping_list'
+            )
+        ]
 
 
 class Follow(models.Model):
@@ -203,3 +237,90 @@ class Follow(models.Model):
             fields=['author', 'user'],
             name='unique_object'
         )]
+
+
+class RecipeScore(models.Model):
+    """Предрасчитанная популярность рецепта для сортировки ленты."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity',
+        verbose_name='Рецепт'
+    )
+    score = models.FloatField(
+        default=0,
+        db_index=True,
+        verbose_name='Популярность'
+    )
+    stale = models.BooleanField(
+        default=True,
+        db_index=True,
+        verbose_name='Требует пересчёта'
+    )
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+
+    def __str__(self):
+        return f'{self.recipe} {self.score:.3f}'
+
+
+class ImageTask(models.Model):
+    """Задача фоновой обработки фото рецепта.
+
+    Таблица служит очередью для команды process_images, поэтому
+    отдельный брокер сообщений не нужен.
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_tasks',
+        verbose_name='Рецепт'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Обновлена'
+    )
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = 'Обработка фото'
+        verbose_name_plural = 'Обработка фото'
+        indexes = (
+            models.Index(fields=('status', 'created'),
+                         name='image_task_status_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.status}'
@@ -0,0 +1,59 @@
+import math
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, RecipeScore, ShoppingList
+
+FAVORITE_WEIGHT = 2
+SHOPPING_CART_WEIGHT = 1
+# Рецепт, опубликованный на это время позже, нужно добавить в избранное
+# в 10 раз больше раз, чтобы он оказался ниже.
+DECAY_SECONDS = 7 * 24 * 60 * 60
+EPOCH = 1640995200  # 2022-01-01 UTC
+
+
+def popularity(favorites, shopping_carts, pub_date):
+    """Оценка «горячести» рецепта.
+
+    Свежесть учитывается через дату публикации, а не текущее время,
+    поэтому оценку нужно пересчитывать только при изменении избранного
+    и списков покупок самого рецепта.
+    """
+    engagement = (FAVORITE_WEIGHT * favorites
+                  + SHOPPING_CART_WEIGHT * shopping_carts)
+    return (math.log10(1 + engagement)
+            + (pub_date.timestamp() - EPOCH) / DECAY_SECONDS)
+
+
+def mark_stale(recipe_ids):
+    """Помечает оценки рецептов для пересчёта.
+
+    Строка оценки создаётся вместе с рецептом; рецептам, созданным в обход
+    сигналов (bulk_create), её добавит refresh_scores.
+    """
+    RecipeScore.objects.filter(recipe_id__in=recipe_ids).update(stale=True)
+
+
+def create_score(recipe):
+    """Оценка нового рецепта: без избранного и списков покупок."""
+    RecipeScore.objects.create(
+        recipe=recipe, stale=False,
+        score=popularity(recipe.favorites_count, 0, recipe.pub_date),
+    )
+
+
+def refresh_scores(recipe_ids):
+    """Пересчитывает оценки указанных рецептов одним проходом."""
+    shopping_carts = ShoppingList.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(total=Count('pk')).values('total')
+    recipes = Recipe.objects.filter(id__in=recipe_ids).order_by().annotate(
+        shopping_carts=Coalesce(Subquery(shopping_carts), 0)
+    ).values_list('id', 'favorites_count', 'shopping_carts', 'pub_date')
+    scores = [
+        RecipeScore(recipe_id=pk, score=popularity(favorites, carts, date))
+        for pk, favorites, carts, date in recipes
+    ]
+    RecipeScore.objects.bulk_update(scores, ('score',))
+    return len(scores)
@@ -0,0 +1,88 @@
+import sys
+from bisect import bisect_left
+from threading import Lock
+
+from django.db import DatabaseError
+
+from .cache import get_model_version
+from .models import Ingredient
+
+PREFIX_END = '\U0010ffff'
+
+
+class IngredientIndex:
+    """Отсортированный массив названий ингредиентов в памяти процесса.
+
+    Совпадения по префиксу находятся бинарным поиском, совпадения по
+    подстроке добавляются после них. Индекс строится при первом поиске
+    или заранее в RecipesConfig.ready() и перестраивается, когда меняется
+    общая для всех процессов версия модели Ingredient (в том числе после
+    команды ingred). Версия, названия и записи хранятся одним кортежем,
+    поэтому поиск идёт без блокировок и не видит их вперемешку.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._data = None
+
+    def build(self, version=None):
+        if version is None:
+            version = get_model_version(Ingredient)
+        rows = sorted(
+            (name.lower(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        self._data = (version, tuple(row[0] for row in rows),
+                      tuple(row[1:] for row in rows))
+        return self._data
+
+    def warm(self):
+        try:
+            self.build()
+        except DatabaseError:
+            # Таблицы может ещё не быть (например, до migrate):
+            # индекс соберётся при первом поиске.
+            self.reset()
+
+    def reset(self):
+        self._data = None
+
+    def _load(self):
+        version = get_model_version(Ingredient)
+        data = self._data
+        if data is None or data[0] != version:
+            with self._lock:
+                data = self._data
+                if data is None or data[0] != version:
+                    data = self.build(version)
+        return data[1:]
+
+    def search(self, value, limit=None):
+        names, items = self._load()
+        value = value.lower()
+        start = bisect_left(names, value)
+        end = bisect_left(names, value + PREFIX_END, start)
+        result = list(items[start:end][:limit])
+        for position, name in enumerate(names):
+            if limit is not None and len(result) >= limit:
+                break
+            if value in name and not start <= position < end:
+                result.append(items[position])
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for pk, name, measurement_unit in result
+        ]
+
+    def stats(self):
+        names, items = self._load()
+        size = sys.getsizeof(names) + sys.getsizeof(items)
+        size += sum(sys.getsizeof(name) for name in names)
+        for item in items:
+            size += sys.getsizeof(item)
+            size += sum(sys.getsizeof(value) for value in item)
+        return {'entries': len(names), 'memory': size}
+
+
+ingredient_index = IngredientIndex()
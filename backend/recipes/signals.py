@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_model_cache
+from .models import Favorite, Ingredient, Recipe, ShoppingList, Tag
+from .scores import create_score, mark_stale
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def reference_changed(sender, **kwargs):
+    invalidate_model_cache(sender)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingList)
+def recipe_engagement_changed(sender, instance, **kwargs):
+    mark_stale((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, raw=False, **kwargs):
+    # Без строки оценки новый рецепт оказался бы в конце сортировки
+    # popular до запуска refresh_scores.
+    if created and not raw:
+        create_score(instance)
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.19 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model_name, field):
+    def run(apps, schema_editor):
+        CustomUser = apps.get_model('users', 'CustomUser')
+        model = apps.get_model('recipes', model_name)
+        CustomUser.objects.update(**{field: Coalesce(Subquery(
+            model.objects.filter(author=OuterRef('pk')).order_by().values(
+                'author'
+            ).annotate(total=Count('id')).values('total')
+        ), 0)})
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0013_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Обновляется при подписке и отписке', verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Обновляется при создании и удалении рецептов', verbose_name='Рецептов'),
+        ),
+        migrations.RunPython(count_related('Recipe', 'recipes_count'),
+                             migrations.RunPython.noop),
+        migrations.RunPython(count_related('Follow', 'followers_count'),
+                             migrations.RunPython.noop),
+    ]
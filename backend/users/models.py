@@ -20,6 +20,18 @@ class CustomUser(AbstractUser):
         verbose_name='Фамилия',
         help_text='Укажите фамилию'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов',
+        help_text='Обновляется при создании и удалении рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков',
+        help_text='Обновляется при подписке и отписке'
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']